@@ -1,18 +1,36 @@
 #!/usr/bin/env python3
+"""
+Command-line entrypoint.
+
+`python main.py run ...` (or just `python main.py ...`) runs the whole stage
+graph; `fetch`, `etl`, `features`, `visualize`, `train`, `evaluate`,
+`backtest`, `scan` and `signals` run one stage. Heavy libraries are imported
+inside the command that needs them, so e.g. `signals` never loads optuna,
+lightgbm or sklearn when its predictions are cached. `--profile-startup`
+re-runs the command under `python -X importtime` and reports the slowest
+imports.
+
+Every command writes a run report (per-stage wall/CPU time, peak RSS, rows
+and hot spots) to reports/runs/ plus a Prometheus textfile; `--profile`
+also dumps a cProfile (or pyinstrument) profile of each stage to
+reports/profiles/<run id>/.
+"""
 import os
 import sys
+import time
+import hashlib
 import argparse
 import subprocess
-import joblib
-import pandas as pd
-from sqlalchemy import create_engine
 
-from scripts.etl import load_raw_to_db
-from scripts.features import build_features
-from scripts.evaluate import evaluate as evaluate_model
-from scripts.backtest import backtest as run_backtest
-from config import DATABASE_URL
-import scripts.train as train
+# Keys of scripts.train.PRUNERS and scripts.train.TRAIN_MODES, listed here so
+# argument parsing doesn't import optuna
+PRUNER_NAMES = ['hyperband', 'median', 'none', 'successive_halving']
+TRAIN_MODES = ['auto', 'search', 'refresh']
+# scripts.telemetry.PROFILERS
+PROFILERS = ['cprofile', 'pyinstrument']
+STAGE_NAMES = ['create_db', 'fetch', 'etl', 'features', 'visualize', 'train', 'evaluate',
+               'visualize_metrics', 'scan', 'backtest', 'signals']
+
 
 def run_subprocess(script_name, args=None):
     root_dir = os.path.dirname(__file__)
@@ -36,19 +54,24 @@ def run_subprocess(script_name, args=None):
     subprocess.run(cmd, check=True, env=env)
 
 
-def generate_signals(model_path, threshold, output_path="data/results/signals.csv"):
+def generate_signals(threshold, output_path="data/results/signals.csv", model_version=None):
     """
-    Load the trained model, fetch the latest features from DB, predict next-day returns,
+    Load the trained model (the current registry version unless `model_version`
+    is given), fetch the latest features from DB, predict next-day returns,
     and emit buy/sell signals based on threshold.
     """
-    engine = create_engine(DATABASE_URL)
-    df_feat = pd.read_sql_table('daily_features', engine, parse_dates=['date'])
-    latest = df_feat.sort_values('date').groupby('symbol').tail(1)
+    import pandas as pd
+    from scripts.feature_store import read_features, latest_start
+    from scripts import prediction_store, model_registry
+
+    # Score with the columns the served model was trained on, not whatever the store holds
+    model_version = model_registry.resolve(model_version)
+    feature_cols = model_registry.manifest(model_version)['feature_cols']
+    # Only the model's columns, from the oldest of the per-symbol latest bars on
+    df_feat = read_features(feature_cols, start=latest_start())
+    latest = df_feat.groupby('symbol').tail(1)
 
-    model = joblib.load(model_path)
-    feature_cols = [c for c in latest.columns if c not in ['symbol', 'date']]
-    X_pred = latest[feature_cols].values
-    preds = model.predict(X_pred)
+    preds = prediction_store.predict(latest, feature_cols, model_version)
 
     signals = pd.DataFrame({
         'symbol': latest['symbol'],
@@ -61,64 +84,413 @@ def generate_signals(model_path, threshold, output_path="data/results/signals.cs
     print(f"Signals written to {output_path}")
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Run full stock-prediction workflow.")
-    parser.add_argument('--symbols', '-s', nargs='+', default=None,
-                        help="List of ticker symbols to fetch (e.g. AAPL MSFT). If omitted, skips fetching.")
-    parser.add_argument('--function', '-f', default='TIME_SERIES_DAILY',
-                        help="Alpha Vantage function to use for fetch_data.")
-    parser.add_argument('--interval', '-i', default='60min',
-                        help="Data interval (for intraday endpoints).")
-    parser.add_argument('--outputsize', '-o', default='full',
-                        help="Output size (compact/full).")
-    parser.add_argument('--datadir', '-d', default='data/raw',
-                        help="Directory to store raw CSVs.")
-    parser.add_argument('--trials', type=int, default=50,
-                        help="Number of Optuna trials for hyperparameter search.")
-    parser.add_argument('--threshold', type=float, default=0.0,
-                        help="Threshold for generating BUY/SELL signals.")
-    parser.add_argument('--capital', type=float, default=1_000_000,
-                        help="Initial capital for backtest.")
-    args = parser.parse_args()
-
-    print("==> Creating database...")
-    run_subprocess('create_db.py')
+def files_fingerprint(paths):
+    """Combined content hash of `paths`, or None if any of them is missing."""
+    from scripts.etl import file_hash
+    if not paths or not all(os.path.isfile(p) for p in paths):
+        return None
+    h = hashlib.sha256()
+    for p in sorted(paths):
+        h.update(f"{p}:{file_hash(p)}".encode())
+    return h.hexdigest()
+
+
+def etl_fingerprint():
+    from sqlalchemy import text
+    from scripts.db import get_engine
+    engine = get_engine()
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT symbol, last_date, file_hash FROM etl_state ORDER BY symbol")).fetchall()
+    except Exception:  # no etl_state table yet
+        return None
+    return hashlib.sha256(repr(rows).encode()).hexdigest() if rows else None
+
+
+def build_stages(args):
+    import glob
+    import datetime
+    from config import DATABASE_URL
+    from scripts.db import get_engine
+    from scripts.feature_store import data_version
+    from scripts.features import FEATURE_INDICATORS
+    from scripts.pipeline import Stage
+    from scripts import model_registry
 
+    plots_dir = os.path.join('results', 'plots')
+    data_plots = [os.path.join(plots_dir, f) for f in (
+        'close_price_distribution.png', 'volume_distribution.png',
+        'rsi_over_time.png', 'correlation_heatmap.png')]
+
+    artifacts = {
+        'database': lambda: hashlib.sha256(DATABASE_URL.encode()).hexdigest(),
+        'raw': lambda: files_fingerprint(glob.glob(os.path.join(args.datadir, '*.csv'))),
+        'ohlcv': etl_fingerprint,
+        'features': lambda: data_version(get_engine()),
+        'data_plots': lambda: files_fingerprint(data_plots),
+        'model': model_registry.current_version,
+        'metrics': lambda: files_fingerprint([os.path.join('reports', 'metrics', 'evaluation_metrics.json')]),
+        'metrics_plot': lambda: files_fingerprint([os.path.join(plots_dir, 'evaluation_metrics.png')]),
+        'threshold_results': lambda: files_fingerprint([os.path.join('data', 'results', 'threshold_results.csv')]),
+        'backtest_results': lambda: files_fingerprint([os.path.join('reports', 'backtest', 'results.csv')]),
+        'signals': lambda: files_fingerprint([os.path.join('data', 'results', 'signals.csv')]),
+    }
+
+    stages = [Stage('create_db', lambda: run_subprocess('create_db.py'), outputs=['database'])]
     if args.symbols:
-        print("==> Fetching raw data...")
-        fetch_args = ['-s'] + args.symbols + ['-f', args.function,
-                        '-i', args.interval, '-o', args.outputsize,
-                        '-d', args.datadir]
-        run_subprocess('fetch_data.py', fetch_args)
+        # Keyed on the calendar day so a daily run refetches once
+        stages.append(Stage('fetch', lambda: cmd_fetch(args), outputs=['raw'], params={
+            'symbols': args.symbols, 'function': args.function, 'interval': args.interval,
+            'outputsize': args.outputsize, 'day': datetime.date.today().isoformat()}))
+    stages += [
+        Stage('etl', lambda: cmd_etl(args), inputs=['database', 'raw'], outputs=['ohlcv'],
+              params={'full': args.full_etl}),
+        Stage('features', lambda: cmd_features(args), inputs=['ohlcv'], outputs=['features'],
+              params={'indicators': FEATURE_INDICATORS, 'full': args.full_rebuild,
+                      'bars': args.bars}),
+        Stage('visualize', lambda: cmd_visualize(args), inputs=['features'], outputs=['data_plots'],
+              params={'symbols': args.plot_symbols, 'points': args.points}, lock='matplotlib'),
+        Stage('train', lambda: cmd_train(args), inputs=['features'], outputs=['model'],
+              params={'trials': args.trials, 'pruner': args.pruner, 'mode': args.train_mode,
+                      'search_every': args.search_every, 'drift': args.drift,
+                      'promote': not args.no_promote, 'seed': args.seed,
+                      'memory_budget': args.memory_budget, 'truncate': args.truncate_to_budget}),
+        Stage('evaluate', lambda: cmd_evaluate(args), inputs=['features', 'model'], outputs=['metrics'],
+              params={'model_version': args.model_version, 'window': args.rolling_window,
+                      'resamples': args.resamples, 'block': args.block_length}),
+        Stage('visualize_metrics', lambda: cmd_visualize_metrics(args), inputs=['metrics'],
+              outputs=['metrics_plot'], lock='matplotlib'),
+        Stage('scan', lambda: cmd_scan(args), inputs=['features', 'model'],
+              outputs=['threshold_results'],
+              params={'capital': args.capital, 'grid': [args.scan_start, args.scan_stop, args.scan_num],
+                      'model_version': args.model_version}),
+        Stage('backtest', lambda: cmd_backtest(args), inputs=['features', 'model'],
+              outputs=['backtest_results'],
+              params={'threshold': args.threshold, 'capital': args.capital,
+                      'model_version': args.model_version, 'window': args.rolling_window,
+                      'resamples': args.resamples, 'block': args.block_length}),
+        Stage('signals', lambda: cmd_signals(args), inputs=['features', 'model'], outputs=['signals'],
+              params={'threshold': args.threshold, 'model_version': args.model_version}),
+    ]
+    return stages, artifacts
+
+
+def cmd_fetch(args):
+    from scripts.fetch_data import fetch_all
+    failed = fetch_all(args.symbols, args.function, args.interval, args.outputsize, args.datadir,
+                       rate=args.rate, workers=args.fetch_workers)
+    if failed:
+        raise RuntimeError(f"Failed to fetch: {' '.join(failed)}")
+
+
+def cmd_etl(args):
+    from scripts.etl import load_raw_to_db
+    load_raw_to_db(raw_folder=args.datadir, incremental=not args.full_etl, workers=args.workers)
+
+
+def cmd_features(args):
+    from scripts.features import build_features
+    build_features(full_rebuild=args.full_rebuild, workers=args.workers, bars=args.bars)
 
-    print("==> ETL into database...")
-    load_raw_to_db(raw_folder=args.datadir)
 
-    print("==> Building features...")
-    build_features()
+def cmd_visualize(args):
+    from scripts import visualize
+    visualize.main(symbols=args.plot_symbols, points=args.points, workers=args.plot_workers)
 
-    print("==> Visualizing data...")
-    run_subprocess('visualize.py')
 
-    print(f"==> Training model ({args.trials} trials) and saving...")
-    train.train_and_save(trials=args.trials, model_path=os.path.join('models', 'model.pkl'))
+def cmd_train(args):
+    import scripts.train as train
+    train.train_and_save(trials=args.trials, jobs=args.jobs, pruner=args.pruner, mode=args.train_mode,
+                         search_every_days=args.search_every, drift=args.drift,
+                         promote=not args.no_promote, seed=args.seed,
+                         memory_budget=args.memory_budget, truncate=args.truncate_to_budget)
 
-    print("==> Evaluating model...")
-    evaluate_model()
 
-    print("==> Visualizing evaluation metrics...")
-    run_subprocess('visualize_metrics.py')
+def cmd_evaluate(args):
+    from scripts.evaluate import evaluate
+    evaluate(model_version=args.model_version, window=args.rolling_window,
+             resamples=args.resamples, block=args.block_length)
 
-    print("==> Scanning thresholds...")
-    run_subprocess('threshold_scan.py')
 
-    print(f"==> Backtesting with threshold={args.threshold} and capital={args.capital}...")
-    run_backtest(threshold=args.threshold, initial_capital=args.capital)
+def cmd_visualize_metrics(args):
+    from scripts import visualize_metrics
+    visualize_metrics.main()
 
-    print("==> Generating next-day BUY/SELL signals...")
-    generate_signals(model_path=os.path.join('models', 'model.pkl'), threshold=args.threshold)
+
+def cmd_scan(args):
+    import numpy as np
+    from scripts.threshold_scan import scan
+    scan(np.linspace(args.scan_start, args.scan_stop, args.scan_num), args.capital,
+         model_version=args.model_version)
+
+
+def cmd_backtest(args):
+    from scripts.backtest import backtest
+    backtest(threshold=args.threshold, initial_capital=args.capital, model_version=args.model_version,
+             window=args.rolling_window, resamples=args.resamples, block=args.block_length)
+
+
+def cmd_walk_forward(args):
+    from scripts.walk_forward import walk_forward, model_params
+    walk_forward(step=args.step, train_days=args.train_days, expanding=args.expanding,
+                 start=args.start, embargo=args.embargo, threshold=args.threshold,
+                 cost_bps=args.cost_bps, slippage_bps=args.slippage_bps, workers=args.workers,
+                 params=model_params(args.model_version), rounds=args.rounds,
+                 initial_capital=args.capital)
+
+
+def cmd_signals(args):
+    generate_signals(threshold=args.threshold, model_version=args.model_version)
+
+
+def cmd_run(args):
+    from scripts.pipeline import run_pipeline
+    # Plot stages run on worker threads
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    stages, artifacts = build_stages(args)
+    summary = run_pipeline(stages, artifacts, only=args.only, start=args.start,
+                           force=args.force, workers=args.parallel, profile=args.profile,
+                           profile_dir=args.profile_dir)
+    if any(status in ('failed', 'blocked') for _, status, *_ in summary):
+        sys.exit(1)
     print("Workflow complete.")
 
 
+def profile_startup(argv, top=15):
+    """Run the command again under -X importtime and summarize where startup time went."""
+    cmd = [sys.executable, '-X', 'importtime', os.path.abspath(__file__)] + argv
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - t0
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            sys.stderr.write(line + '\n')
+            continue
+        self_us, cum_us, name = line[len('import time:'):].split('|')
+        # Only top-level imports; nested ones are included in their parent's cumulative time
+        if self_us.strip().isdigit() and not name.startswith('  '):
+            imports.append((int(cum_us) / 1e6, name.strip()))
+
+    imports.sort(reverse=True)
+    total = sum(t for t, _ in imports)
+    print(f"\nStartup profile for `{' '.join(argv)}`: {wall:.2f}s wall, {total:.2f}s importing "
+          f"{len(imports)} top-level modules")
+    for seconds, name in imports[:top]:
+        print(f"  {seconds:7.3f}s  {name}")
+    return proc.returncode
+
+
+def add_fetch_args(p):
+    p.add_argument('--symbols', '-s', nargs='+', default=None,
+                   help="List of ticker symbols to fetch (e.g. AAPL MSFT). If omitted, skips fetching.")
+    p.add_argument('--function', '-f', default='TIME_SERIES_DAILY',
+                   help="Alpha Vantage function to use for fetch_data.")
+    p.add_argument('--interval', '-i', default='60min',
+                   help="Data interval (for intraday endpoints).")
+    p.add_argument('--outputsize', '-o', default='full',
+                   help="Output size (compact/full).")
+    p.add_argument('--rate', type=float, default=5,
+                   help="Alpha Vantage calls per minute allowed by your plan.")
+    p.add_argument('--fetch-workers', type=int, default=4,
+                   help="Concurrent fetch requests in flight.")
+
+
+def add_datadir_arg(p):
+    p.add_argument('--datadir', '-d', default='data/raw',
+                   help="Directory to store raw CSVs.")
+
+
+def add_workers_arg(p):
+    p.add_argument('--workers', type=int, default=1,
+                   help="Processes loading / computing shards of the symbol universe in parallel.")
+
+
+def add_etl_args(p):
+    p.add_argument('--full-etl', action='store_true',
+                   help="Truncate daily_ohlcv and reload every CSV instead of an incremental upsert.")
+
+
+def add_features_args(p):
+    p.add_argument('--full-rebuild', action='store_true',
+                   help="Recompute daily_features over all history instead of appending new bars.")
+    p.add_argument('--bars', default=None, metavar='FREQ',
+                   help="Build features from the intraday bar store resampled to FREQ "
+                        "(e.g. 5min, 1h, 1D) instead of daily_ohlcv.")
+
+
+def add_visualize_args(p):
+    p.add_argument('--plot-symbols', nargs='+', default=None, metavar='SYMBOL',
+                   help="Restrict the data plots to these symbols and draw one figure for each.")
+    p.add_argument('--points', type=int, default=1000,
+                   help="Points per plotted line after LTTB downsampling.")
+    p.add_argument('--plot-workers', type=int, default=None,
+                   help="Processes rendering figures (default: one per core).")
+
+
+def add_plot_symbols_arg(p):
+    p.add_argument('--symbols', nargs='+', dest='plot_symbols', default=None, metavar='SYMBOL',
+                   help="Same as --plot-symbols.")
+
+
+def add_train_args(p):
+    p.add_argument('--trials', type=int, default=50,
+                   help="Number of Optuna trials for hyperparameter search.")
+    p.add_argument('--jobs', type=int, default=1,
+                   help="Worker processes running Optuna trials concurrently.")
+    p.add_argument('--pruner', default='median', choices=PRUNER_NAMES,
+                   help="Optuna pruner used to stop unpromising trials after any CV fold.")
+    p.add_argument('--train-mode', default='auto', choices=TRAIN_MODES,
+                   help="'search' reruns the hyperparameter search; 'refresh' continues boosting the "
+                        "saved model on new rows; 'auto' refreshes unless a search is due or drift is detected.")
+    p.add_argument('--search-every', type=int, default=7, metavar='DAYS',
+                   help="In auto mode, rerun the search when the last one is this many days old.")
+    p.add_argument('--drift', type=float, default=0.10,
+                   help="In auto mode, rerun the search when RMSE on new rows exceeds the CV RMSE "
+                        "by this fraction.")
+    p.add_argument('--no-promote', action='store_true',
+                   help="Register the trained model without making it the current version.")
+    p.add_argument('--seed', type=int, default=None,
+                   help="Seed the hyperparameter sampler so a search is reproducible.")
+    p.add_argument('--memory-budget', type=float, default=None, metavar='MB',
+                   help="Train out of core: stream the design matrix to disk and bin it in "
+                        "batches, holding the search to about this much memory.")
+    p.add_argument('--truncate-to-budget', action='store_true',
+                   help="With --memory-budget, train on only the most recent rows that fit instead "
+                        "of failing when the full history does not.")
+
+
+def add_model_version_arg(p):
+    p.add_argument('--model-version', default=None,
+                   help="Model registry version to use (default: the current one).")
+
+
+def add_threshold_arg(p):
+    p.add_argument('--threshold', type=float, default=0.0,
+                   help="Threshold for generating BUY/SELL signals.")
+
+
+def add_capital_arg(p):
+    p.add_argument('--capital', type=float, default=1_000_000,
+                   help="Initial capital for backtest.")
+
+
+def add_analytics_args(p):
+    # Defaults of scripts.analytics.WINDOW, RESAMPLES and BLOCK
+    p.add_argument('--rolling-window', type=int, default=63,
+                   help="Trading days in each rolling-window metric.")
+    p.add_argument('--resamples', type=int, default=2000,
+                   help="Block-bootstrap resamples behind each confidence interval.")
+    p.add_argument('--block-length', type=float, default=10,
+                   help="Mean block length (trading days) of the stationary bootstrap.")
+
+
+def add_scan_args(p):
+    p.add_argument('--scan-start', type=float, default=0.0)
+    p.add_argument('--scan-stop', type=float, default=0.02)
+    p.add_argument('--scan-num', type=int, default=201,
+                   help="Number of evenly spaced thresholds in [scan-start, scan-stop].")
+
+
+def add_walk_forward_args(p):
+    p.add_argument('--step', type=int, default=63,
+                   help="Trading days per test window (the model is retrained for each).")
+    p.add_argument('--train-days', type=int, default=756,
+                   help="Trading days in each rolling training window.")
+    p.add_argument('--expanding', action='store_true',
+                   help="Train on all history before each window instead of a rolling window.")
+    p.add_argument('--start', default=None,
+                   help="First test date (default: once a full training window exists).")
+    p.add_argument('--embargo', type=int, default=1,
+                   help="Trading days left out between training and test.")
+    p.add_argument('--cost-bps', type=float, default=5.0,
+                   help="Commission in basis points of traded notional.")
+    p.add_argument('--slippage-bps', type=float, default=5.0,
+                   help="Slippage in basis points of traded notional.")
+    p.add_argument('--rounds', type=int, default=None,
+                   help="Boosting rounds per window (default: the model's searched n_estimators).")
+    p.add_argument('--workers', type=int, default=None,
+                   help="Windows trained in parallel (default: one per core).")
+
+
+COMMANDS = {
+    'run': (cmd_run, "Run the full workflow as a stage graph.",
+            [add_fetch_args, add_datadir_arg, add_workers_arg, add_etl_args, add_features_args,
+             add_visualize_args, add_train_args, add_model_version_arg, add_threshold_arg,
+             add_capital_arg, add_scan_args, add_analytics_args]),
+    'fetch': (cmd_fetch, "Download raw OHLCV CSVs.", [add_fetch_args, add_datadir_arg]),
+    'etl': (cmd_etl, "Load raw CSVs into the database.",
+            [add_datadir_arg, add_workers_arg, add_etl_args]),
+    'features': (cmd_features, "Build technical-indicator features.",
+                 [add_workers_arg, add_features_args]),
+    'visualize': (cmd_visualize, "Plot feature distributions, correlations and RSI.",
+                  [add_visualize_args, add_plot_symbols_arg]),
+    'train': (cmd_train, "Tune and train the model.", [add_train_args]),
+    'evaluate': (cmd_evaluate, "Evaluate the model on the test period.",
+                 [add_model_version_arg, add_analytics_args]),
+    'backtest': (cmd_backtest, "Backtest one threshold.",
+                 [add_model_version_arg, add_threshold_arg, add_capital_arg, add_analytics_args]),
+    'scan': (cmd_scan, "Backtest a grid of thresholds.",
+             [add_model_version_arg, add_capital_arg, add_scan_args]),
+    'signals': (cmd_signals, "Write next-day BUY/SELL signals.",
+                [add_model_version_arg, add_threshold_arg]),
+    'walkforward': (cmd_walk_forward, "Walk-forward backtest with retraining and trading costs.",
+                    [add_walk_forward_args, add_model_version_arg, add_threshold_arg, add_capital_arg]),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the stock-prediction workflow or one of its stages.")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Report import time of the command that follows.")
+    sub = parser.add_subparsers(dest='command')
+    for name, (func, help_text, arg_groups) in COMMANDS.items():
+        p = sub.add_parser(name, help=help_text, description=help_text)
+        for add in arg_groups:
+            add(p)
+        p.add_argument('--profile', nargs='?', const='cprofile', choices=PROFILERS,
+                       help="Profile each stage (default cprofile) into reports/profiles/.")
+        p.set_defaults(func=func)
+    run = sub.choices['run']
+    run.add_argument('--from', dest='start', choices=STAGE_NAMES,
+                     help="Run this stage and everything downstream of it.")
+    run.add_argument('--only', nargs='+', choices=STAGE_NAMES,
+                     help="Run only these stages.")
+    run.add_argument('--force', action='store_true',
+                     help="Run selected stages even if their inputs are unchanged.")
+    run.add_argument('--parallel', type=int, default=4,
+                     help="Maximum number of independent stages run at once.")
+    return parser
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    profile = '--profile-startup' in argv
+    if profile:
+        argv.remove('--profile-startup')
+        sys.exit(profile_startup(argv))
+    # Without a subcommand, run the whole workflow as before
+    if not any(a in COMMANDS or a in ('-h', '--help') for a in argv[:1]):
+        argv = ['run'] + argv
+    args = build_parser().parse_args(argv)
+    from scripts import telemetry
+    run_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{args.command}"
+    args.profile_dir = os.path.join(telemetry.PROFILE_DIR, run_id)
+    try:
+        if args.command == 'run':
+            args.func(args)
+            return
+        with telemetry.stage(args.command) as rec, \
+                telemetry.profiled(args.command, args.profile, args.profile_dir):
+            args.func(args)
+        print(f"{args.command}: peak RSS {telemetry.format_rss(rec['rss_before_mb'], rec['rss_after_mb'])}")
+    finally:
+        telemetry.write_report(args.command, argv, run_id=run_id)
+        if args.profile:
+            print(f"Profiles written to {args.profile_dir}")
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,208 @@
+# scripts/analytics.py
+"""
+Breakdowns and confidence intervals for evaluate and backtest, computed with
+grouped NumPy reductions instead of loops over symbols or resamples.
+
+  prediction metrics   RMSE, hit rate (sign agreement) and IC (Pearson
+                       correlation of prediction and realized target)
+  return metrics       annualized Sharpe, total return and max drawdown
+
+Both come per symbol (np.bincount over factorized symbols), per rolling
+window of `window` dates (cumulative sums over per-date aggregates) and as
+stationary block bootstrap intervals over dates. The bootstrap (Politis &
+Romano) draws blocks of geometric length with mean `block`, which keeps the
+serial correlation of daily returns that an i.i.d. resample would destroy.
+All resamples are drawn as one (resamples x dates) index matrix and reduced
+along its rows, in chunks of at most `max_cells` cells.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from scripts import telemetry
+
+WINDOW = 63
+RESAMPLES = 2000
+BLOCK = 10
+ALPHA = 0.05
+TRADING_DAYS = 252
+
+
+def stationary_bootstrap(n, resamples, block=BLOCK, rng=None):
+    """(resamples x n) row indices of stationary block bootstrap samples of range(n)."""
+    rng = np.random.default_rng(rng)
+    new_block = rng.random((resamples, n)) < 1.0 / block
+    new_block[:, 0] = True
+    cols = np.arange(n)
+    # Column where each position's block started, and where that block starts in the data
+    block_col = np.maximum.accumulate(np.where(new_block, cols, 0), axis=1)
+    starts = rng.integers(0, n, size=(resamples, n))
+    return (np.take_along_axis(starts, block_col, axis=1) + cols - block_col) % n
+
+
+def bootstrap(stats, series, resamples=RESAMPLES, block=BLOCK, alpha=ALPHA, seed=0,
+              max_cells=1 << 24):
+    """
+    Percentile intervals for `stats`, a dict of name -> fn(**resampled) that
+    reduces (resamples x n) arrays along axis 1. `series` holds the per-date
+    arrays (all of length n) handed to each fn after resampling.
+    Returns {name: {'estimate', 'lo', 'hi'}}.
+    """
+    n = len(next(iter(series.values())))
+    rng = np.random.default_rng(seed)
+    full = {k: np.asarray(v, dtype=np.float64)[None, :] for k, v in series.items()}
+    out = {name: {'estimate': float(fn(**full)[0])} for name, fn in stats.items()}
+    if n < 2 or resamples < 1:
+        return {name: {**v, 'lo': None, 'hi': None} for name, v in out.items()}
+    draws = {name: [] for name in stats}
+    chunk = max(1, max_cells // n)
+    with telemetry.span('bootstrap', 'bootstrap', rows=resamples * n, resamples=resamples):
+        for i in range(0, resamples, chunk):
+            idx = stationary_bootstrap(n, min(chunk, resamples - i), block, rng)
+            sample = {k: v[0][idx] for k, v in full.items()}
+            for name, fn in stats.items():
+                draws[name].append(fn(**sample))
+    for name in stats:
+        values = np.concatenate(draws[name])
+        values = values[np.isfinite(values)]
+        lo, hi = np.quantile(values, [alpha / 2, 1 - alpha / 2]) if len(values) else (np.nan, np.nan)
+        out[name].update(lo=float(lo), hi=float(hi))
+    return out
+
+
+def _corr(n, sx, sy, sxx, syy, sxy):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sy / n
+        return cov / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+
+
+def _sums(codes, size, y, pred):
+    """Per-group count, squared error, hits and the sums a correlation needs."""
+    def add(w=None):
+        return np.bincount(codes, weights=w, minlength=size).astype(np.float64)
+    return {'n': add(), 'sse': add((pred - y) ** 2), 'hits': add(((pred > 0) == (y > 0)) * 1.0),
+            'sx': add(pred), 'sy': add(y), 'sxx': add(pred * pred), 'syy': add(y * y),
+            'sxy': add(pred * y)}
+
+
+def prediction_metrics(keys, y, pred):
+    """n, RMSE, hit rate and IC for each distinct key (e.g. symbol), sorted by key."""
+    codes, uniques = pd.factorize(np.asarray(keys), sort=True)
+    s = _sums(codes, len(uniques), np.asarray(y, dtype=np.float64), np.asarray(pred, dtype=np.float64))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({'key': uniques, 'n': s['n'].astype(np.int64),
+                             'rmse': np.sqrt(s['sse'] / s['n']), 'hit_rate': s['hits'] / s['n'],
+                             'ic': _corr(s['n'], s['sx'], s['sy'], s['sxx'], s['syy'], s['sxy'])})
+
+
+def daily_prediction_sums(dates, y, pred):
+    """Per-date sums (rows sorted by date): dates, and n, sse, hits and cross-sectional IC."""
+    dates = np.asarray(dates)
+    starts = np.r_[0, np.flatnonzero(dates[1:] != dates[:-1]) + 1]
+    codes = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(dates)]))
+    s = _sums(codes, len(starts), np.asarray(y, dtype=np.float64), np.asarray(pred, dtype=np.float64))
+    ic = _corr(s['n'], s['sx'], s['sy'], s['sxx'], s['syy'], s['sxy'])
+    return dates[starts], {'n': s['n'], 'sse': s['sse'], 'hits': s['hits'], 'ic': ic}
+
+
+def _rolling_sum(x, window):
+    c = np.cumsum(np.r_[0.0, x])
+    out = c[window:] - c[:-window]
+    return np.r_[np.full(min(window - 1, len(x)), np.nan), out]
+
+
+def rolling_prediction_metrics(dates, daily, window=WINDOW):
+    """RMSE, hit rate and mean daily IC over each trailing `window` dates."""
+    n = _rolling_sum(daily['n'], window)
+    ic = np.nan_to_num(daily['ic'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({'date': dates, 'rmse': np.sqrt(_rolling_sum(daily['sse'], window) / n),
+                             'hit_rate': _rolling_sum(daily['hits'], window) / n,
+                             'ic': _rolling_sum(ic, window)
+                             / _rolling_sum(np.isfinite(daily['ic']) * 1.0, window)})
+
+
+def prediction_stats():
+    """Bootstrap statistics over per-date sums (see daily_prediction_sums)."""
+    def rmse(n, sse, hits, ic):
+        return np.sqrt(sse.sum(axis=1) / n.sum(axis=1))
+
+    def hit_rate(n, sse, hits, ic):
+        return hits.sum(axis=1) / n.sum(axis=1)
+
+    def mean_ic(n, sse, hits, ic):
+        return np.nanmean(ic, axis=1)
+    return {'rmse': rmse, 'hit_rate': hit_rate, 'ic': mean_ic}
+
+
+def sharpe(returns, axis=-1):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return returns.mean(axis=axis) / returns.std(axis=axis, ddof=1) * np.sqrt(TRADING_DAYS)
+
+
+def max_drawdown(returns, axis=-1):
+    nav = np.cumprod(1 + returns, axis=axis)
+    peak = np.maximum.accumulate(nav, axis=axis)
+    return ((peak - nav) / peak).max(axis=axis)
+
+
+def return_stats():
+    """Bootstrap statistics over a daily return series."""
+    return {'sharpe': lambda r: sharpe(r, axis=1),
+            'total_return': lambda r: np.prod(1 + r, axis=1) - 1,
+            'max_dd': lambda r: max_drawdown(r, axis=1)}
+
+
+def return_metrics(keys, returns):
+    """
+    Bars, Sharpe, total return and max drawdown of each key's return series,
+    sorted by key. Rows of one key must be in date order.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    codes, uniques = pd.factorize(np.asarray(keys), sort=True)
+    order = np.argsort(codes, kind='stable')
+    codes, r = codes[order], returns[order]
+    size = len(uniques)
+    n = np.bincount(codes, minlength=size).astype(np.float64)
+    total = np.bincount(codes, weights=r, minlength=size)
+    sq = np.bincount(codes, weights=r * r, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+        std = np.sqrt(np.maximum(sq - n * mean * mean, 0.0) / (n - 1))
+        sr = mean / std * np.sqrt(TRADING_DAYS)
+    # Log NAV per key; lifting each key above the previous one's range lets a
+    # single maximum.accumulate run over all keys without carrying a peak across
+    log_nav = np.log1p(r)
+    starts = np.r_[0, np.flatnonzero(codes[1:] != codes[:-1]) + 1]
+    log_nav = np.cumsum(log_nav) - np.repeat(np.cumsum(log_nav)[starts] - log_nav[starts],
+                                             np.diff(np.r_[starts, len(r)]))
+    lift = np.cumsum(np.full(size, np.ptp(log_nav) + 1.0 if len(r) else 0.0))[codes]
+    peak = np.maximum.accumulate(log_nav + lift) - lift
+    dd = np.zeros(size)
+    np.maximum.at(dd, codes, -np.expm1(log_nav - peak))
+    last = np.r_[starts[1:], len(r)] - 1
+    total_return = np.full(size, np.nan)
+    total_return[codes[starts]] = np.expm1(log_nav[last])
+    return pd.DataFrame({'key': uniques, 'n': n.astype(np.int64), 'sharpe': sr,
+                         'total_return': total_return, 'max_dd': dd})
+
+
+def rolling_return_metrics(dates, returns, window=WINDOW):
+    """Sharpe, return and max drawdown of a daily return series over each trailing `window` dates."""
+    r = np.asarray(returns, dtype=np.float64)
+    out = pd.DataFrame({'date': dates, 'sharpe': np.nan, 'return': np.nan, 'max_dd': np.nan})
+    if len(r) < window:
+        return out
+    view = sliding_window_view(r, window)
+    out.loc[window - 1:, 'sharpe'] = sharpe(view, axis=1)
+    out.loc[window - 1:, 'return'] = np.prod(1 + view, axis=1) - 1
+    out.loc[window - 1:, 'max_dd'] = max_drawdown(view, axis=1)
+    return out
+
+
+def format_ci(name, ci, spec='.4f', scale=1, unit=''):
+    """'name: estimate [lo, hi]' (the interval omitted when there was nothing to resample)."""
+    text = f"{name}: {ci['estimate'] * scale:{spec}}{unit}"
+    if ci['lo'] is None:
+        return text
+    return f"{text}  [{ci['lo'] * scale:{spec}}{unit}, {ci['hi'] * scale:{spec}}{unit}]"
@@ -1,58 +1,139 @@
 # scripts/backtest.py
 import os
+import json
 
 import numpy as np
 import pandas as pd
-import joblib
-from sqlalchemy import create_engine
-from config import DATABASE_URL
-
-
-def backtest(threshold=0.0, initial_capital=1_000_000):
-
-    engine = create_engine(DATABASE_URL)
-    df = pd.read_sql(
-        "SELECT date, symbol, O, H, L, C AS close, V, rsi_14, sma_20 "
-        "FROM daily_features ORDER BY date",
-        engine, parse_dates=['date']
-    )
-    df['target'] = df.groupby('symbol')['close'].pct_change().shift(-1)
-    df.dropna(inplace=True)
-
-    test = df[df['date'] >= '2025-01-01'].copy()
-    X_test = test[['O', 'H', 'L', 'close', 'V', 'rsi_14', 'sma_20']].rename(columns={'close': 'C'})
-
-    model = joblib.load("models/model.pkl")
-    test['pred'] = model.predict(X_test)
-
-    test['signal'] = np.where(test['pred'] > threshold, 1,
-                              np.where(test['pred'] < -threshold, -1, 0))
-
-    test['ret'] = test.groupby('symbol')['close'].pct_change()
-    test['strat_ret'] = test['signal'].shift(1) * test['ret']
-
-    daily = (test
-             .groupby('date')[['strat_ret']]
-             .mean()
-             .sort_index()
-             )
-
-
-    daily['nav'] = (1 + daily['strat_ret']).cumprod() * initial_capital
-
-    total_return = daily['nav'].iloc[-1] / initial_capital - 1
-    daily_vol = daily['strat_ret'].std()
-    sharpe = (daily['strat_ret'].mean() / daily_vol) * np.sqrt(252)
+from scripts.feature_store import read_features
+from scripts import analytics, prediction_store
+
+
+def predict_test(model_version=None):
+    """Test-period rows with the model's prediction and each bar's realized return."""
+    # A short margin before the test split gives each symbol's first test bar its `ret`
+    feature_cols = ['O', 'H', 'L', 'C', 'V', 'rsi_14', 'sma_20']
+    df = read_features(feature_cols, start=pd.Timestamp('2025-01-01') - pd.Timedelta(days=14),
+                       returns=True)
+    # One filtered copy instead of dropna + mask + copy
+    keep = df[feature_cols + ['target']].notna().all(axis=1).to_numpy()
+    test = df[keep & (df['date'] >= '2025-01-01').to_numpy()]
+    del df
+    test = test.copy(deep=False)
+    test['pred'] = prediction_store.predict(test, feature_cols, model_version)
+    return test
+
+
+def prev_by_symbol(values, symbols):
+    """For rows sorted by date, each row's value on its symbol's previous row (NaN on the first)."""
+    codes = pd.factorize(symbols)[0]
+    order = np.argsort(codes, kind='stable')
+    ordered = np.asarray(values, dtype=np.float64)[order]
+    prev = np.concatenate(([np.nan], ordered[:-1]))
+    prev[1:][codes[order][1:] != codes[order][:-1]] = np.nan
+    out = np.empty_like(prev)
+    out[order] = prev
+    return out
+
+
+def daily_strategy_returns(test, thresholds, max_cells=1 << 24):
+    """
+    Equal-weighted daily strategy return for every threshold at once.
+
+    Signals form a (rows x thresholds) matrix by broadcasting the predictions
+    against the grid; each symbol trades its own previous bar's signal, and
+    rows are averaged per date with np.add.reduceat. The grid is processed in
+    blocks of at most `max_cells` matrix cells. Returns (dates, returns[dates x thresholds]).
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    dates = test['date'].to_numpy()
+    pred_prev = prev_by_symbol(test['pred'].to_numpy(), test['symbol'].to_numpy())
+    ret = test['ret'].to_numpy()
+    valid = ~np.isnan(pred_prev) & ~np.isnan(ret)
+    pred_prev = np.where(valid, pred_prev, 0.0)[:, None]
+    ret = np.where(valid, ret, 0.0)[:, None]
+
+    starts = np.concatenate(([0], np.flatnonzero(dates[1:] != dates[:-1]) + 1))
+    counts = np.add.reduceat(valid.astype(np.int64), starts)[:, None]
+
+    out = np.empty((len(starts), len(thresholds)))
+    block = max(1, max_cells // max(len(test), 1))
+    for i in range(0, len(thresholds), block):
+        thr = thresholds[i:i + block]
+        signal = (pred_prev > thr).astype(np.int8) - (pred_prev < -thr).astype(np.int8)
+        out[:, i:i + block] = np.add.reduceat(signal * ret, starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out /= counts
+    return dates[starts], out
+
+
+def performance(strat_ret, initial_capital=1_000_000):
+    """NAV, total return, annualized Sharpe and max drawdown for each column of strat_ret."""
+    missing = np.isnan(strat_ret)
+    nav = np.cumprod(1 + np.where(missing, 0.0, strat_ret), axis=0) * initial_capital
+    nav[missing] = np.nan
+    peak = np.fmax.accumulate(nav, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe = np.nanmean(strat_ret, axis=0) / np.nanstd(strat_ret, axis=0, ddof=1) * np.sqrt(252)
+        max_dd = np.nanmax((peak - nav) / peak, axis=0)
+    total_return = nav[-1] / initial_capital - 1
+    return nav, total_return, sharpe, max_dd
+
+
+def scan_thresholds(thresholds, initial_capital=1_000_000, test=None, model_version=None):
+    """
+    Evaluate a whole grid of thresholds from a single prediction pass.
+    Returns one row per threshold with total return, Sharpe and max drawdown.
+    """
+    test = predict_test(model_version) if test is None else test
+    _, strat_ret = daily_strategy_returns(test, thresholds)
+    _, total_return, sharpe, max_dd = performance(strat_ret, initial_capital)
+    return pd.DataFrame({'threshold': thresholds, 'return': total_return,
+                         'sharpe': sharpe, 'max_dd': max_dd})
+
+
+def symbol_strategy_returns(test, threshold):
+    """Each row's return from holding its symbol's previous-bar signal (NaN where unknown)."""
+    pred_prev = prev_by_symbol(test['pred'].to_numpy(), test['symbol'].to_numpy())
+    signal = (pred_prev > threshold).astype(np.int8) - (pred_prev < -threshold).astype(np.int8)
+    return np.where(np.isnan(pred_prev), np.nan, signal * test['ret'].to_numpy())
+
+
+def backtest(threshold=0.0, initial_capital=1_000_000, model_version=None,
+             window=analytics.WINDOW, resamples=analytics.RESAMPLES, block=analytics.BLOCK):
+
+    test = predict_test(model_version)
+    dates, strat_ret = daily_strategy_returns(test, [threshold])
+    nav, total_return, sharpe, max_dd = performance(strat_ret, initial_capital)
+
+    daily = pd.DataFrame({'strat_ret': strat_ret[:, 0], 'nav': nav[:, 0]},
+                         index=pd.Index(dates, name='date'))
 
     print(f"Threshold = {threshold:.3f}")
-    print(f"Total return:   {total_return * 100:.1f}%")
-    print(f"Annualized Sharpe: {sharpe:.2f}")
-    print(f"Max drawdown:   {((daily['nav'].cummax() - daily['nav']) / daily['nav'].cummax()).max() * 100:.1f}%")
+    print(f"Total return:   {total_return[0] * 100:.1f}%")
+    print(f"Annualized Sharpe: {sharpe[0]:.2f}")
+    print(f"Max drawdown:   {max_dd[0] * 100:.1f}%")
+
+    row_ret = symbol_strategy_returns(test, threshold)
+    known = ~np.isnan(row_ret)
+    by_symbol = analytics.return_metrics(test['symbol'].to_numpy()[known], row_ret[known])
+    traded = ~np.isnan(strat_ret[:, 0])
+    rolling = analytics.rolling_return_metrics(dates[traded], strat_ret[traded, 0], window)
+    ci = analytics.bootstrap(analytics.return_stats(), {'r': strat_ret[traded, 0]}, resamples, block)
+    print(f"{1 - analytics.ALPHA:.0%} block-bootstrap intervals ({resamples} resamples):")
+    print("  " + analytics.format_ci('Sharpe', ci['sharpe'], '.2f'))
+    print("  " + analytics.format_ci('Total return', ci['total_return'], '.1f', 100, '%'))
+    print("  " + analytics.format_ci('Max drawdown', ci['max_dd'], '.1f', 100, '%'))
 
     out_dir = os.path.join("reports", "backtest")
     os.makedirs(out_dir, exist_ok=True)
     csv_path = os.path.join(out_dir, "results.csv")
     daily.reset_index()[['date', 'nav']].to_csv(csv_path, index=False)
+    by_symbol.rename(columns={'key': 'symbol'}).to_csv(os.path.join(out_dir, "by_symbol.csv"),
+                                                       index=False)
+    rolling.to_csv(os.path.join(out_dir, "rolling.csv"), index=False)
+    with open(os.path.join(out_dir, "bootstrap.json"), "w") as f:
+        json.dump({'threshold': threshold, 'alpha': analytics.ALPHA, 'resamples': resamples,
+                   'block': block, **ci}, f, indent=2)
 
     return daily
 
@@ -0,0 +1,197 @@
+# scripts/bar_store.py
+"""
+Append-only store of intraday bars, partitioned by symbol and month.
+
+Layout under BAR_DIR:
+  <symbol>/index.json     per month: file, rows, first and last bar time;
+                          plus the symbol's last bar time (its high-water mark)
+  <symbol>/YYYY-MM.npz    compressed: t (bar times, int64 ns, sorted),
+                          values (O, H, L, C, V x rows, float64)
+
+Bars at or before a symbol's high-water mark are ignored on append, so
+re-loading an overlapping CSV never duplicates or rewrites history; only the
+month files new bars fall into are rewritten (to a temporary file, then
+renamed). A read opens only the months overlapping its range and slices
+them by binary search on t, so one symbol-day costs one small decompress.
+
+resample() turns bars into coarser bars (e.g. 1min -> 15min) or into daily
+OHLCV with a volume-weighted average price. Bar times label the end of the
+bar, as Alpha Vantage does: a bar stamped 09:35 covers 09:30-09:35.
+"""
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+BAR_DIR = os.path.join('data', 'bars')
+INDEX = 'index.json'
+COLUMNS = ['O', 'H', 'L', 'C', 'V']
+# Regular session used for daily bars; a day is complete once a bar at or after
+# the close (or any bar of a later day) is stored
+SESSION = ('09:30', '16:00')
+DAY_NS = 86_400 * 10 ** 9
+
+
+def _index(root, symbol):
+    path = os.path.join(root, symbol, INDEX)
+    if not os.path.isfile(path):
+        return {'months': {}, 'last': None}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_index(root, symbol, index):
+    path = os.path.join(root, symbol, INDEX)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(path + '.tmp', path)
+
+
+def _load_month(root, symbol, entry):
+    with np.load(os.path.join(root, symbol, entry['file'])) as npz:
+        return npz['t'], npz['values']
+
+
+def symbols(root=BAR_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(s for s in os.listdir(root) if os.path.isfile(os.path.join(root, s, INDEX)))
+
+
+def last_bar(symbol, root=BAR_DIR):
+    """Time of the symbol's newest stored bar, or None."""
+    last = _index(root, symbol)['last']
+    return pd.Timestamp(last) if last is not None else None
+
+
+def append(symbol, df, root=BAR_DIR):
+    """
+    Store the rows of `df` (date, O, H, L, C, V; any order) newer than the
+    symbol's last bar. Returns the number of bars appended.
+    """
+    index = _index(root, symbol)
+    t = df['date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    order = np.argsort(t, kind='stable')
+    t = t[order]
+    values = df[COLUMNS].to_numpy(dtype=np.float64)[order].T
+    keep = np.ones(len(t), dtype=bool) if index['last'] is None else t > index['last']
+    keep[1:] &= t[1:] != t[:-1]  # duplicate timestamps within the file
+    t, values = t[keep], values[:, keep]
+    if not len(t):
+        return 0
+
+    os.makedirs(os.path.join(root, symbol), exist_ok=True)
+    months = t.view('datetime64[ns]').astype('datetime64[M]')
+    bounds = np.flatnonzero(months[1:] != months[:-1]) + 1
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(t)]):
+        month = str(months[lo])
+        entry = index['months'].get(month)
+        mt, mv = t[lo:hi], values[:, lo:hi]
+        if entry is not None:
+            old_t, old_v = _load_month(root, symbol, entry)
+            mt, mv = np.concatenate([old_t, mt]), np.concatenate([old_v, mv], axis=1)
+        name = f"{month}.npz"
+        tmp = os.path.join(root, symbol, f".{name}.tmp.npz")
+        np.savez_compressed(tmp, t=mt, values=mv)
+        os.replace(tmp, os.path.join(root, symbol, name))
+        index['months'][month] = {'file': name, 'rows': int(len(mt)),
+                                  'first': int(mt[0]), 'last': int(mt[-1])}
+    index['last'] = int(t[-1])
+    _write_index(root, symbol, index)
+    return int(len(t))
+
+
+def read(symbol, start=None, end=None, root=BAR_DIR):
+    """Bars of `symbol` with start <= date < end, as a DataFrame of date, O, H, L, C, V."""
+    index = _index(root, symbol)
+    lo = pd.Timestamp(start).value if start is not None else None
+    hi = pd.Timestamp(end).value if end is not None else None
+    ts, vs = [], []
+    for _, entry in sorted(index['months'].items()):
+        if (lo is not None and entry['last'] < lo) or (hi is not None and entry['first'] >= hi):
+            continue
+        t, v = _load_month(root, symbol, entry)
+        a = np.searchsorted(t, lo) if lo is not None else 0
+        b = np.searchsorted(t, hi) if hi is not None else len(t)
+        ts.append(t[a:b])
+        vs.append(v[:, a:b])
+    t = np.concatenate(ts) if ts else np.empty(0, dtype=np.int64)
+    v = np.concatenate(vs, axis=1) if vs else np.empty((len(COLUMNS), 0))
+    out = pd.DataFrame({'date': t.view('datetime64[ns]')})
+    for k, c in enumerate(COLUMNS):
+        out[c] = v[k]
+    return out
+
+
+def read_day(symbol, day, root=BAR_DIR):
+    """All bars of `symbol` on calendar day `day`."""
+    day = pd.Timestamp(day).normalize()
+    return read(symbol, day, day + pd.Timedelta(days=1), root)
+
+
+def resample(df, freq='1D', session=SESSION, complete_only=False):
+    """
+    Aggregate bars (date, O, H, L, C, V sorted by date) to `freq`: O first,
+    H max, L min, C last, V sum and VWAP the volume-weighted typical price
+    (H + L + C) / 3. Daily bars keep only bars inside `session` and are
+    stamped at midnight; intraday bars are stamped with the end of their
+    interval. complete_only=True drops a final interval that is still open:
+    a day with no bar at or after the session close, or an intraday bar whose
+    last input bar ends before it does.
+    """
+    t = df['date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    v = {c: df[c].to_numpy(dtype=np.float64) for c in COLUMNS}
+    daily = pd.Timedelta(freq) >= pd.Timedelta(days=1)
+    if daily:
+        step = pd.Timedelta(freq).value
+        tod = t % DAY_NS
+        open_, close = (pd.Timedelta(s + ':00').value for s in session)
+        if complete_only and len(t) and tod[-1] < close:
+            keep = t < t[-1] - tod[-1]  # bars before the (still open) last day
+            t, tod, v = t[keep], tod[keep], {c: x[keep] for c, x in v.items()}
+        keep = (tod > open_) & (tod <= close)
+        t, v = t[keep], {c: x[keep] for c, x in v.items()}
+        key = t // step * step
+    else:
+        step = pd.Timedelta(freq).value
+        key = (t - 1) // step * step + step
+        if complete_only and len(t) and t[-1] != key[-1]:
+            keep = key != key[-1]
+            t, key, v = t[keep], key[keep], {c: x[keep] for c, x in v.items()}
+    cols = ['date'] + COLUMNS + ['VWAP']
+    if not len(t):
+        return pd.DataFrame({c: pd.Series(dtype='datetime64[ns]' if c == 'date' else np.float64)
+                             for c in cols})
+    starts = np.r_[0, np.flatnonzero(key[1:] != key[:-1]) + 1]
+    ends = np.r_[starts[1:], len(key)] - 1
+    volume = np.add.reduceat(v['V'], starts)
+    typical = (v['H'] + v['L'] + v['C']) / 3
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.add.reduceat(typical * v['V'], starts) / volume
+    out = pd.DataFrame({'date': key[starts].view('datetime64[ns]'),
+                        'O': v['O'][starts], 'H': np.maximum.reduceat(v['H'], starts),
+                        'L': np.minimum.reduceat(v['L'], starts), 'C': v['C'][ends],
+                        'V': volume, 'VWAP': vwap})
+    return out[cols]
+
+
+def read_bars(symbol_list, freq='1D', start=None, root=BAR_DIR, complete_only=False):
+    """
+    Bars of several symbols resampled to `freq` and stamped at or after
+    `start` (one date, or a dict of each symbol's own), with a `symbol`
+    column, sorted by (symbol, date).
+    """
+    frames = []
+    for s in sorted(symbol_list):
+        first = start.get(s) if isinstance(start, dict) else start
+        # The interval stamped `first` begins up to one interval earlier
+        lo = pd.Timestamp(first) - pd.Timedelta(freq) if first is not None else None
+        bars = resample(read(s, lo, root=root), freq, complete_only=complete_only)
+        if first is not None:
+            bars = bars[bars['date'] >= pd.Timestamp(first)].reset_index(drop=True)
+        bars.insert(0, 'symbol', s)
+        frames.append(bars)
+    if not frames:
+        return pd.DataFrame(columns=['symbol', 'date'] + COLUMNS + ['VWAP'])
+    return pd.concat(frames, ignore_index=True)
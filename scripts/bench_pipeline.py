@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: every pipeline stage on synthetic data at several scales.
+
+  python -m scripts.bench_pipeline --save-baseline          # record a baseline
+  python -m scripts.bench_pipeline                          # compare against it
+  python -m scripts.bench_pipeline --scales small 300x5 50x1@15min --repeat 3
+
+A scale is a name from SCALES or SYMBOLSxYEARS[@FREQ], FREQ being 1D
+(business days) or an intraday bar size such as 60min or 5min (regular
+09:30-16:00 session). For each scale a synthetic universe is written once as
+raw CSVs in the fetch_data schema (date, O, H, L, C, V, newest bar first) by
+scripts/synthetic.py.
+Then, in a fresh scratch directory with its own embedded database, each
+stage runs as a separate `main.py` command: create_db, etl, features, train
+(a seeded search of --trials trials without pruning), evaluate, backtest and
+scan. Every command writes a telemetry run report, which gives the stage's
+wall time, CPU time and peak RSS. Because each stage has its own process,
+peak RSS is the stage's own.
+
+With --repeat N each scale runs N times from scratch and the median is kept.
+Results are written to reports/bench/<timestamp>.json. Each stage is
+compared with the baseline (reports/bench/baseline.json by default) and
+flagged as a regression if it is more than --tolerance slower (and at least
+--min-seconds slower) or uses more than --tolerance more memory (and at
+least --min-mb more). The exit code is 1 when anything regressed.
+
+config.py must read DATABASE_URL from the environment, as in the README
+template.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+
+from scripts.bench_backends import resolve
+from scripts.synthetic import bar_index, write_ohlcv_csvs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUT_DIR = os.path.join('reports', 'bench')
+BASELINE = os.path.join(OUT_DIR, 'baseline.json')
+# name: (symbols, years, bar frequency)
+SCALES = {
+    'small': (20, 2, '1D'),
+    'medium': (200, 5, '1D'),
+    'large': (1000, 10, '1D'),
+    'intraday': (20, 1, '60min'),
+}
+DEFAULT_SCALES = ['small', 'medium']
+STAGES = ['create_db', 'etl', 'features', 'train', 'evaluate', 'backtest', 'scan']
+
+
+def parse_scale(spec):
+    """(name, symbols, years, freq) for a SCALES name or SYMBOLSxYEARS[@FREQ]."""
+    if spec in SCALES:
+        return (spec, *SCALES[spec])
+    size, _, freq = spec.partition('@')
+    try:
+        symbols, years = (int(v) for v in size.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Unknown scale {spec!r}: use one of {', '.join(SCALES)} or SYMBOLSxYEARS[@FREQ]") from None
+    return spec, symbols, years, freq or '1D'
+
+
+def commands(raw_dir, trials):
+    """main.py arguments per stage."""
+    return {
+        'create_db': ['run', '--only', 'create_db', '--force'],
+        'etl': ['etl', '--datadir', raw_dir, '--full-etl'],
+        'features': ['features', '--full-rebuild'],
+        'train': ['train', '--train-mode', 'search', '--trials', str(trials), '--pruner', 'none',
+                  '--jobs', '1', '--seed', '0'],
+        'evaluate': ['evaluate'],
+        'backtest': ['backtest'],
+        'scan': ['scan'],
+    }
+
+
+def run_stages(url, raw_dir, trials, workdir):
+    """Run every stage in `workdir` and return {stage: telemetry record}."""
+    env = dict(os.environ, DATABASE_URL=resolve(url, workdir), MPLBACKEND='Agg',
+               PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    out = {}
+    cmds = commands(raw_dir, trials)
+    for stage in STAGES:
+        argv = cmds[stage]
+        proc = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py')] + argv, cwd=workdir,
+                              env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stdout[-3000:], proc.stderr[-3000:])
+            raise RuntimeError(f"Stage {stage} failed in {workdir}")
+        with open(os.path.join(workdir, 'reports', 'runs', 'latest.json')) as f:
+            report = json.load(f)
+        rec = next(s for s in report['stages'] if s['stage'] == stage or s['stage'] == argv[0])
+        out[stage] = {'wall': rec['wall'], 'cpu': rec['cpu'], 'peak_rss_mb': rec['rss_after_mb'],
+                      'rows_in': rec['rows_in'], 'rows_out': rec['rows_out']}
+    return out
+
+
+def median_runs(runs):
+    return {stage: {k: float(np.median([r[stage][k] for r in runs])) if runs[0][stage][k] is not None
+                    else None for k in runs[0][stage]}
+            for stage in runs[0]}
+
+
+def bench_scale(spec, url, trials, repeat, tmp, seed=0):
+    name, symbols, years, freq = spec
+    raw_dir = os.path.join(tmp, name.replace('@', '_'), 'raw')
+    bars = write_ohlcv_csvs(raw_dir, symbols, bar_index(years * 252, freq), seed)
+    print(f"[{name}] {symbols} symbols x {bars:,} bars ({years}y at {freq})")
+    runs = []
+    for k in range(repeat):
+        workdir = os.path.join(os.path.dirname(raw_dir), f"run{k}")
+        os.makedirs(workdir)
+        runs.append(run_stages(url, raw_dir, trials, workdir))
+        shutil.rmtree(workdir)
+        total = sum(s['wall'] for s in runs[-1].values())
+        print(f"[{name}] run {k + 1}/{repeat}: {total:.1f}s over all stages")
+    shutil.rmtree(raw_dir)
+    return {'symbols': symbols, 'years': years, 'freq': freq, 'bars': bars, 'rows': symbols * bars,
+            'trials': trials, 'repeat': repeat, 'stages': median_runs(runs)}
+
+
+def machine():
+    return {'platform': platform.platform(), 'python': platform.python_version(),
+            'cpus': os.cpu_count(), 'processor': platform.processor() or platform.machine()}
+
+
+def compare(results, baseline, tolerance=0.20, min_seconds=0.25, min_mb=25.0):
+    """Rows of (scale, stage, wall, base wall, rss, base rss, flag) and whether anything regressed."""
+    rows, regressed = [], False
+    for scale, res in results['scales'].items():
+        base = baseline.get('scales', {}).get(scale) if baseline else None
+        if base and (base['rows'], base['trials']) != (res['rows'], res['trials']):
+            base = None  # same name, different workload
+        for stage, cur in res['stages'].items():
+            ref = base['stages'].get(stage) if base else None
+            flags = []
+            if ref:
+                dt = cur['wall'] - ref['wall']
+                if dt > tolerance * ref['wall'] and dt > min_seconds:
+                    flags.append('SLOWER')
+                elif -dt > tolerance * ref['wall'] and -dt > min_seconds:
+                    flags.append('faster')
+                if cur['peak_rss_mb'] is not None and ref['peak_rss_mb'] is not None:
+                    dm = cur['peak_rss_mb'] - ref['peak_rss_mb']
+                    if dm > tolerance * ref['peak_rss_mb'] and dm > min_mb:
+                        flags.append('MORE MEMORY')
+                    elif -dm > tolerance * ref['peak_rss_mb'] and -dm > min_mb:
+                        flags.append('less memory')
+            regressed |= any(f.isupper() for f in flags)
+            rows.append((scale, stage, cur['wall'], ref['wall'] if ref else None, cur['peak_rss_mb'],
+                         ref['peak_rss_mb'] if ref else None, ', '.join(flags)))
+    return rows, regressed
+
+
+def print_table(rows):
+    def pct(cur, ref):
+        return f"{(cur / ref - 1) * 100:+6.0f}%" if ref else '      -'
+    print(f"\n{'scale':<12} {'stage':<10} {'seconds':>9} {'baseline':>9} {'':>7} "
+          f"{'peak MB':>9} {'baseline':>9} {'':>7}")
+    for scale, stage, wall, base_wall, rss, base_rss, flag in rows:
+        print(f"{scale:<12} {stage:<10} {wall:9.2f} "
+              f"{base_wall if base_wall is not None else float('nan'):9.2f} {pct(wall, base_wall)} "
+              f"{rss or float('nan'):9.0f} {base_rss if base_rss is not None else float('nan'):9.0f} "
+              f"{pct(rss, base_rss) if rss else '      -'}  {flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic data.")
+    parser.add_argument('--scales', nargs='+', type=parse_scale, default=None,
+                        help=f"Scale names ({', '.join(SCALES)}) or SYMBOLSxYEARS[@FREQ]; "
+                             f"default {' '.join(DEFAULT_SCALES)}.")
+    parser.add_argument('--backend', default='sqlite',
+                        help="'sqlite', 'duckdb' (fresh embedded database per run) or a DATABASE_URL.")
+    parser.add_argument('--trials', type=int, default=3, help="Seeded Optuna trials in the train stage.")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per scale; the median is kept.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store these results as the baseline (merged per scale).")
+    parser.add_argument('--tolerance', type=float, default=0.20,
+                        help="Relative slowdown or memory growth counted as a regression.")
+    parser.add_argument('--min-seconds', type=float, default=0.25,
+                        help="Ignore slowdowns smaller than this, whatever the ratio.")
+    parser.add_argument('--min-mb', type=float, default=25.0,
+                        help="Ignore memory growth smaller than this, whatever the ratio.")
+    args = parser.parse_args()
+    scales = args.scales or [parse_scale(s) for s in DEFAULT_SCALES]
+
+    results = {'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+               'backend': args.backend, 'machine': machine(), 'scales': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for spec in scales:
+            results['scales'][spec[0]] = bench_scale(spec, args.backend, args.trials, args.repeat,
+                                                     tmp, args.seed)
+
+    baseline = None
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('backend') != args.backend:
+            print(f"Baseline was recorded on backend {baseline.get('backend')}; not comparing")
+            baseline = None
+        elif baseline.get('machine') != results['machine']:
+            print("Warning: baseline was recorded on a different machine:", baseline.get('machine'))
+    rows, regressed = compare(results, baseline, args.tolerance, args.min_seconds, args.min_mb)
+    print_table(rows)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    path = os.path.join(OUT_DIR, f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {path}")
+    if args.save_baseline:
+        merged = dict(results, scales={**(baseline or {}).get('scales', {}), **results['scales']})
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(merged, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif baseline is None:
+        print("No baseline to compare against; record one with --save-baseline")
+    if regressed and not args.save_baseline:
+        print("Regressions detected")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
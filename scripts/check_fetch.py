@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Check scripts/fetch_data.py against a local Alpha Vantage stub.
+
+Starts an HTTP server on localhost that answers like the API for a few
+made-up symbols, runs the fetcher CLI against it with --base-url, and checks
+what each symbol got and how many requests it took (tests/test_fetch_data.py
+runs the same check under pytest):
+
+  OK       CSV at once                              fetched, 1 request
+  BUSY     HTTP 503, then CSV                       fetched, 2 requests
+  SLOW     rate-limit 'Note', then CSV              fetched, 2 requests
+  PREMIUM  premium-endpoint 'Information'           failed,  1 request
+  BADKEY   invalid-key 'Information'                failed,  1 request
+  NOPE     'Error Message' (unknown symbol)         failed,  1 request
+
+  python -m scripts.check_fetch
+"""
+import os
+import sys
+import json
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = ("timestamp,open,high,low,close,volume\n"
+       "2025-06-30,101.0,102.5,100.5,102.0,1200000\n"
+       "2025-06-27,100.0,101.5,99.5,101.0,1100000\n")
+NOTE = {'Note': "Thank you for using Alpha Vantage! Our standard API call frequency is "
+                "5 calls per minute and 500 calls per day."}
+PREMIUM = {'Information': "Thank you for using Alpha Vantage! This is a premium endpoint. "
+                          "You may subscribe to any of the premium plans to instantly unlock it."}
+BADKEY = {'Information': "The **demo** API key is for demo purposes only. Please claim your "
+                         "free API key to explore our full API offerings."}
+NOPE = {'Error Message': "Invalid API call. Please retry or visit the documentation."}
+# symbol: responses in order (the last repeats), expected outcome, expected requests
+CASES = {
+    'OK': ([CSV], True, 1),
+    'BUSY': ([503, CSV], True, 2),
+    'SLOW': ([NOTE, CSV], True, 2),
+    'PREMIUM': ([PREMIUM], False, 1),
+    'BADKEY': ([BADKEY], False, 1),
+    'NOPE': ([NOPE], False, 1),
+}
+
+
+def make_handler(requests_seen, lock):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            symbol = parse_qs(urlparse(self.path).query).get('symbol', [''])[0]
+            with lock:
+                requests_seen[symbol] += 1
+                n = requests_seen[symbol]
+            responses = CASES[symbol][0] if symbol in CASES else [NOPE]
+            reply = responses[min(n, len(responses)) - 1]
+            if isinstance(reply, int):
+                self.send_response(reply)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = (reply if isinstance(reply, str) else json.dumps(reply)).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv' if isinstance(reply, str) else 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def run_fetcher(tmp):
+    """
+    Run the fetcher CLI on every CASES symbol against the stub, writing under
+    `tmp`. Returns the finished process and each symbol's (fetched, requests).
+    """
+    seen, lock = Counter(), threading.Lock()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(seen, lock))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/query"
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    datadir = os.path.join(tmp, 'raw')
+    try:
+        proc = subprocess.run([sys.executable, '-m', 'scripts.fetch_data', '-s', *CASES,
+                               '-d', datadir, '--base-url', url, '--rate', '600', '--burst', '10',
+                               '--retries', '2', '--cache-dir', os.path.join(tmp, 'cache'),
+                               '--cache-ttl', '0'],
+                              cwd=ROOT, env=env, capture_output=True, text=True)
+    finally:
+        server.shutdown()
+    results = {}
+    for symbol in CASES:
+        path = os.path.join(datadir, f"{symbol}.csv")
+        results[symbol] = (os.path.isfile(path) and len(pd.read_csv(path)) == 2, seen[symbol])
+    return proc, results
+
+
+def main():
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, results = run_fetcher(tmp)
+    print(proc.stdout, end='')
+    for symbol, (_, ok, calls) in CASES.items():
+        fetched, requests = results[symbol]
+        status = 'ok'
+        if fetched != ok or requests != calls:
+            status = 'FAIL'
+            problems.append(symbol)
+        print(f"{symbol:8s} fetched={fetched!s:5s} (expected {ok!s:5s})  "
+              f"requests={requests} (expected {calls})  {status}")
+    if proc.returncode == 0:
+        problems.append('exit code 0 despite failed symbols')
+    if problems:
+        print(proc.stderr[-2000:], end='')
+        raise SystemExit(f"Fetcher check failed: {', '.join(problems)}")
+    print("Fetcher check passed")
+
+if __name__ == '__main__':
+    main()
@@ -1,47 +1,206 @@
 # scripts/etl.py
 import os
+import time
+import hashlib
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
-from config import DATABASE_URL
+from sqlalchemy import (MetaData, Table, Column, Text, String, DateTime, Float, BigInteger,
+                        inspect, text)
+from scripts.db import (get_engine, create_index, quote, truncate, upsert_stmt, write_frame,
+                        writer_processes)
+from scripts.shards import run_sharded
+from scripts import bar_store, telemetry
 
-def load_raw_to_db(raw_folder="data/raw"):
-    engine = create_engine(DATABASE_URL, echo=False)
+OHLCV_COLUMNS = ['symbol', 'date', 'O', 'H', 'L', 'C', 'V']
+
+metadata = MetaData()
+
+daily_ohlcv = Table(
+    'daily_ohlcv', metadata,
+    Column('symbol', Text),
+    Column('date', DateTime),
+    Column('O', Float),
+    Column('H', Float),
+    Column('L', Float),
+    Column('C', Float),
+    Column('V', BigInteger),
+    # Volume-weighted average price; only known for days built from intraday bars
+    Column('VWAP', Float),
+)
+
+# Per-symbol high-water mark: last loaded bar and the hash of the CSV it came from.
+etl_state = Table(
+    'etl_state', metadata,
+    Column('symbol', String(16), primary_key=True),
+    Column('last_date', DateTime),
+    Column('file_hash', String(64)),
+)
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _ensure_schema(engine):
+    metadata.create_all(engine, checkfirst=True)
+    with engine.begin() as conn:
+        if 'VWAP' not in {c['name'] for c in inspect(conn).get_columns('daily_ohlcv')}:
+            # Tables created before intraday loading
+            conn.execute(text(f"ALTER TABLE daily_ohlcv ADD COLUMN {quote(engine, 'VWAP')} FLOAT"))
+        create_index(conn, 'daily_ohlcv', 'uq_symbol_date', ['symbol', 'date'], unique=True,
+                     prefixes={'symbol': 16})
+
+
+def _load_state(engine):
     with engine.connect() as conn:
-        conn.execute(text("TRUNCATE TABLE daily_ohlcv;"))
+        rows = conn.execute(etl_state.select()).fetchall()
+    return {r.symbol: (r.last_date, r.file_hash) for r in rows}
+
+
+def _daily_from_bars(symbol, df, last_date, bars_root):
+    """
+    Append intraday bars to the bar store; returns the complete days after
+    `last_date` as daily rows (resampled from the store, so a day split over
+    two downloads is aggregated whole) and the number of bars appended.
+    """
+    with telemetry.span('write:bar_store', 'write') as s:
+        s.rows = appended = bar_store.append(symbol, df, bars_root)
+    start = pd.Timestamp(last_date) + pd.Timedelta(days=1) if last_date is not None else None
+    with telemetry.span('read:bar_store', 'read') as s:
+        bars = bar_store.read(symbol, start, root=bars_root)
+        s.rows = len(bars)
+    daily = bar_store.resample(bars, '1D', complete_only=True)
+    daily['V'] = daily['V'].round().astype('int64')
+    daily.insert(0, 'symbol', symbol)
+    return daily, appended
+
 
-    for fname in os.listdir(raw_folder):
-        if not fname.lower().endswith(".csv"):
+def _changed_rows(engine, symbol, df):
+    """
+    Mask of the rows of `df` (bars up to the symbol's high-water mark) that
+    are missing from daily_ohlcv or differ from the stored bar, e.g. after a
+    split adjustment or a corrected print.
+    """
+    with telemetry.span('read:daily_ohlcv', 'read') as s:
+        stored = pd.read_sql(daily_ohlcv.select()
+                             .with_only_columns(*(daily_ohlcv.c[c] for c in OHLCV_COLUMNS[1:]))
+                             .where(daily_ohlcv.c.symbol == symbol)
+                             .where(daily_ohlcv.c.date <= df['date'].max().to_pydatetime()),
+                             engine, parse_dates=['date'])
+        s.rows = len(stored)
+    old = df[['date']].merge(stored.drop_duplicates('date'), on='date', how='left')
+    prices = ['O', 'H', 'L', 'C']
+    # rtol covers backends that store Float as single precision
+    same = np.isclose(df[prices].to_numpy(dtype=np.float64), old[prices].to_numpy(dtype=np.float64),
+                      rtol=1e-6, atol=0).all(axis=1)
+    same &= (df['V'].to_numpy(dtype=np.float64) == old['V'].to_numpy(dtype=np.float64))
+    return ~same
+
+
+def _load_files(paths, state, keys, batch_size, bars_root=bar_store.BAR_DIR):
+    """Load one shard of CSVs; runs in a worker process when sharded."""
+    engine = get_engine()
+    stats = []
+    for path in paths:
+        symbol = os.path.basename(path).replace(".csv", "")
+        start = time.perf_counter()
+
+        digest = file_hash(path)
+        last_date, last_hash = state.get(symbol, (None, None))
+        if digest == last_hash:
+            # Not read at all: no rows counted either way, the flag says why
+            stats.append({'symbol': symbol, 'inserted': 0, 'skipped': 0,
+                          'rows_per_sec': 0.0, 'unchanged': True})
+            print(f"- {symbol}: unchanged since last load, skipped")
             continue
-        symbol = fname.replace(".csv", "")
-        path = os.path.join(raw_folder, fname)
 
-        df = pd.read_csv(path, parse_dates=['date'])
+        with telemetry.span('read:csv', 'read') as s:
+            df = pd.read_csv(path, parse_dates=['date'])
+            s.rows = len(df)
         df['symbol'] = symbol
+        df = df[OHLCV_COLUMNS]
+        if df['date'].dt.normalize().ne(df['date']).any():
+            # Intraday bars: keep them in the bar store, load only finished days
+            new, appended = _daily_from_bars(symbol, df, last_date, bars_root)
+            high_water = new['date'].max() if len(new) else last_date
+            skipped = len(df) - appended
+        else:
+            new = df
+            if last_date is not None:
+                # Bars past the high-water mark, plus earlier ones the file now has different
+                # (the file hash changed, so a historical bar may have been revised)
+                newer = (df['date'] > pd.Timestamp(last_date)).to_numpy()
+                keep = newer.copy()
+                if not newer.all():
+                    keep[~newer] = _changed_rows(engine, symbol, df[~newer].reset_index(drop=True))
+                if (keep & ~newer).any():
+                    print(f"  {symbol}: {int((keep & ~newer).sum())} earlier bars changed, rewriting "
+                          f"them (features --full-rebuild recomputes their indicators)")
+                new = df[keep]
+            high_water = df['date'].max()
+            skipped = len(df) - len(new)
 
-        df.to_sql("daily_ohlcv", engine,
-                  if_exists="append",
-                  index=False,
-                  chunksize=500)
-        print(f"✔ Inserted {len(df)} rows for {symbol}")
+        with engine.begin() as conn:
+            write_frame(conn, new, daily_ohlcv, keys, batch_size=batch_size)
+            conn.execute(upsert_stmt(etl_state, conn.dialect.name, ['symbol']),
+                         {'symbol': symbol, 'file_hash': digest,
+                          'last_date': None if high_water is None
+                          else pd.Timestamp(high_water).to_pydatetime()})
 
-    check_sql = """
-                SELECT COUNT(*)
-                FROM information_schema.STATISTICS
-                WHERE table_schema = DATABASE()
-                  AND table_name = 'daily_ohlcv'
-                  AND index_name = 'idx_symbol_date'; \
-                """
+        elapsed = time.perf_counter() - start
+        rate = len(new) / elapsed if elapsed > 0 else 0.0
+        stats.append({'symbol': symbol, 'inserted': len(new), 'skipped': skipped,
+                      'rows_per_sec': rate, 'unchanged': False})
+        print(f"✔ {symbol}: inserted {len(new)} rows, skipped {skipped} "
+              f"({rate:,.0f} rows/s)")
+    return stats
 
-    with engine.connect() as conn:
-        exists = conn.execute(text(check_sql)).scalar()
-        if not exists:
-            conn.execute(text("""
-                              ALTER TABLE daily_ohlcv
-                                  ADD INDEX idx_symbol_date (symbol(16), date);
-                              """))
-            print("Index idx_symbol_date created.")
-        else:
-            print("Index already exists, skipping.")
+
+def load_raw_to_db(raw_folder="data/raw", incremental=True, batch_size=5000, workers=1,
+                   bars_root=bar_store.BAR_DIR):
+    """
+    Load every CSV in `raw_folder` into daily_ohlcv.
+
+    CSVs of intraday bars (any timestamp past midnight) are appended to the
+    bar store under `bars_root`, and daily_ohlcv gets their completed
+    sessions as daily bars with VWAP.
+
+    With `incremental=True` only files whose content hash changed are read, and
+    only bars newer than the symbol's high-water mark, or daily bars that
+    differ from the stored ones (revised history), are upserted on
+    (symbol, date); the intraday bar store is append-only.
+    `incremental=False` truncates and reloads everything.
+    `workers` > 1 splits the files into that many shards loaded by separate
+    processes. Returns one stats dict per CSV, in file name order: symbol,
+    inserted and skipped row counts, rows_per_sec and `unchanged` (True when
+    the file's hash matched and it was not read; both counts are then 0).
+    """
+    engine = get_engine()
+    _ensure_schema(engine)
+
+    if incremental:
+        state = _load_state(engine)
+        keys = ['symbol', 'date']
+    else:
+        state = {}
+        with engine.begin() as conn:
+            truncate(conn, 'daily_ohlcv')
+            conn.execute(etl_state.delete())
+        keys = None
+
+    paths = [os.path.join(raw_folder, f) for f in os.listdir(raw_folder)
+             if f.lower().endswith(".csv")]
+    parts = run_sharded(_load_files, paths, writer_processes(engine, workers), label='etl',
+                        state=state, keys=keys, batch_size=batch_size, bars_root=bars_root)
+    stats = sorted((s for part in parts for s in part), key=lambda s: s['symbol'])
+
+    inserted = sum(s['inserted'] for s in stats)
+    print(f"ETL done: {inserted} rows written across {len(stats)} files")
+    return stats
 
 # if __name__ == "__main__":
 #     load_raw_to_db()
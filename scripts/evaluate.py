@@ -3,34 +3,26 @@ import json
 import os
 
 import numpy as np
-import pandas as pd
-import joblib
-from sqlalchemy import create_engine
 from sklearn.metrics import mean_squared_error, accuracy_score
-from config import DATABASE_URL
+from scripts.feature_store import read_features
+from scripts import analytics, prediction_store, model_registry
 
-def evaluate():
-    engine = create_engine(DATABASE_URL)
-    df = pd.read_sql(
-        "SELECT * FROM daily_features ORDER BY date",
-        engine, parse_dates=['date']
-    )
-
-    df['target'] = df.groupby('symbol')['C'].pct_change().shift(-1)
-    df.dropna(inplace=True)
-
-
-    test_mask = df['date'] >= '2025-01-01'
-    X_test = df.loc[test_mask, ['O','H','L','C','V','rsi_14','sma_20']]
-    y_test = df.loc[test_mask, 'target'].values
+def evaluate(model_version=None, window=analytics.WINDOW, resamples=analytics.RESAMPLES,
+             block=analytics.BLOCK):
+    # The test split is pushed into the read; target is each symbol's next-day return
+    feature_cols = ['O', 'H', 'L', 'C', 'V', 'rsi_14', 'sma_20']
+    df = read_features(feature_cols, start='2025-01-01', returns=True)
+    test = df[df[feature_cols + ['target']].notna().all(axis=1).to_numpy()]
+    del df
+    y_test = test['target'].values
 
 
     y_base = np.zeros_like(y_test)
     rmse_base = np.sqrt(mean_squared_error(y_test, y_base))
 
 
-    model = joblib.load("models/model.pkl")
-    y_pred = model.predict(X_test)
+    model_version = model_registry.resolve(model_version)
+    y_pred = prediction_store.predict(test, feature_cols, model_version)
     rmse_model = np.sqrt(mean_squared_error(y_test, y_pred))
 
     # 5) 方向准确率
@@ -39,16 +31,33 @@ def evaluate():
     print(f"Baseline RMSE: {rmse_base:.4f}")
     print(f" Model   RMSE: {rmse_model:.4f}")
     print(f"Direction Accuracy: {direction_acc:.4f}")
+
+    # Per symbol, per trailing window of dates, and block-bootstrap intervals over dates
+    symbols = test['symbol'].to_numpy()
+    by_symbol = analytics.prediction_metrics(symbols, y_test, y_pred).rename(columns={'key': 'symbol'})
+    dates, daily = analytics.daily_prediction_sums(test['date'].to_numpy(), y_test, y_pred)
+    rolling = analytics.rolling_prediction_metrics(dates, daily, window)
+    ci = analytics.bootstrap(analytics.prediction_stats(), daily, resamples, block)
+    print(f"{1 - analytics.ALPHA:.0%} block-bootstrap intervals ({resamples} resamples over "
+          f"{len(dates)} dates):")
+    for name in ci:
+        print("  " + analytics.format_ci(name, ci[name]))
+
     metrics = {
+        "model_version": model_version,
         "baseline_rmse": rmse_base,
         "model_rmse": rmse_model,
-        "direction_accuracy": direction_acc
+        "direction_accuracy": direction_acc,
+        "confidence_intervals": {"alpha": analytics.ALPHA, "resamples": resamples,
+                                 "block": block, **ci},
     }
 
     out_dir = os.path.join("reports", "metrics")
     os.makedirs(out_dir, exist_ok=True)
     with open(os.path.join(out_dir, "evaluation_metrics.json"), "w") as f:
         json.dump(metrics, f, indent=2)
+    by_symbol.to_csv(os.path.join(out_dir, "by_symbol.csv"), index=False)
+    rolling.to_csv(os.path.join(out_dir, "rolling.csv"), index=False)
 
 # if __name__ == "__main__":
 #     evaluate()
@@ -0,0 +1,361 @@
+# scripts/feature_store.py
+"""
+Local columnar copy of daily_features, written once by build_features and read
+by every downstream stage instead of `SELECT * FROM daily_features`.
+
+Layout under STORE_DIR:
+  manifest.json                   data version, columns, dtypes and, per year,
+                                  the file location and each symbol's row range
+  <version>/year=YYYY/values.npy  (columns x rows) float64, column-major, so a
+                                  memory-mapped read touches only the requested columns
+  <version>/year=YYYY/date.npy    datetime64[ns] as int64
+Rows inside a year file are sorted by (symbol, date), so a symbol is a
+contiguous slice of it.
+
+The data version is a hash of feature_state; a store whose manifest version
+differs from the database's is stale and read_features falls back to SQL,
+streaming the query in CHUNK_ROWS-row chunks.
+
+By default read_features returns compact dtypes: float32 values, int32
+integers where they fit and a categorical `symbol`, converted per year file
+or per chunk so a full-width float64/object copy of the result never exists.
+"""
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, inspect, bindparam
+from scripts.db import get_engine, quote
+from scripts import telemetry
+
+STORE_DIR = os.path.join('data', 'feature_store')
+MANIFEST = 'manifest.json'
+CHUNK_ROWS = 250_000
+INT32 = np.iinfo(np.int32)
+
+
+def data_version(engine):
+    """Hash of every symbol's materialized extent; None if features were never built."""
+    if not inspect(engine).has_table('feature_state'):
+        return None
+    h = hashlib.sha256()
+    with engine.connect() as conn:
+        for row in conn.execute(text("SELECT symbol, last_date, n_bars, state "
+                                     "FROM feature_state ORDER BY symbol")):
+            h.update(repr(tuple(row)).encode())
+    return h.hexdigest()[:16]
+
+
+def latest_start(engine=None):
+    """
+    Earliest per-symbol last_date: every symbol's latest bar is on or after
+    it, so reading from here yields each symbol's last row. None if features
+    were never built.
+    """
+    engine = engine or get_engine()
+    if not inspect(engine).has_table('feature_state'):
+        return None
+    with engine.connect() as conn:
+        start = conn.execute(text("SELECT MIN(last_date) FROM feature_state")).scalar()
+    return None if start is None else pd.Timestamp(start)
+
+
+def load_manifest(root=STORE_DIR):
+    path = os.path.join(root, MANIFEST)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_atomic(path, arr):
+    tmp = path + '.tmp.npy'
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+def _write_year(root, version, year, df, value_cols):
+    rel = os.path.join(version, f"year={year}")
+    os.makedirs(os.path.join(root, rel), exist_ok=True)
+    values = np.ascontiguousarray(df[value_cols].to_numpy(dtype=np.float64).T)
+    _save_atomic(os.path.join(root, rel, 'values.npy'), values)
+    _save_atomic(os.path.join(root, rel, 'date.npy'),
+                 df['date'].to_numpy(dtype='datetime64[ns]').view(np.int64))
+    symbols = df['symbol'].to_numpy()
+    offsets = np.concatenate(([0], np.flatnonzero(symbols[1:] != symbols[:-1]) + 1, [len(df)]))
+    return {'path': rel, 'rows': len(df),
+            'symbols': {str(symbols[a]): [int(a), int(b)]
+                        for a, b in zip(offsets[:-1], offsets[1:]) if b > a}}
+
+
+def _commit(root, manifest):
+    tmp = os.path.join(root, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(root, MANIFEST))
+    # Drop version directories the new manifest no longer references
+    live = {p['path'].split(os.sep)[0] for p in manifest['years'].values()}
+    for name in os.listdir(root):
+        full = os.path.join(root, name)
+        if os.path.isdir(full) and name not in live:
+            shutil.rmtree(full, ignore_errors=True)
+
+
+def write_store(df, version, root=STORE_DIR):
+    """Replace the whole store with `df` (all daily_features rows)."""
+    os.makedirs(root, exist_ok=True)
+    value_cols = [c for c in df.columns if c not in ('symbol', 'date')]
+    df = df.sort_values(['symbol', 'date'], kind='mergesort')
+    years = df['date'].dt.year
+    manifest = {'version': version, 'columns': value_cols,
+                'dtypes': {c: str(df[c].dtype) for c in value_cols},
+                'years': {str(y): _write_year(root, version, y, part, value_cols)
+                          for y, part in df.groupby(years, sort=True)}}
+    _commit(root, manifest)
+    print(f"✔ Feature store written to {root} ({len(df)} rows, version {version})")
+
+
+def update_store(new_rows, version, prev_version, root=STORE_DIR):
+    """
+    Append `new_rows` by rewriting only the year files they fall into.
+    Returns False if the store is missing or was not at `prev_version`.
+    """
+    manifest = load_manifest(root)
+    value_cols = [c for c in new_rows.columns if c not in ('symbol', 'date')]
+    if manifest is None or manifest['version'] != prev_version or manifest['columns'] != value_cols:
+        return False
+    years = new_rows['date'].dt.year
+    for y, part in new_rows.groupby(years, sort=True):
+        old = read_store(start=pd.Timestamp(year=y, month=1, day=1),
+                         end=pd.Timestamp(year=y + 1, month=1, day=1), root=root, compact=False)
+        merged = pd.concat([old, part[old.columns]], ignore_index=True) if old is not None else part
+        merged = merged.sort_values(['symbol', 'date'], kind='mergesort')
+        manifest['years'][str(y)] = _write_year(root, version, y, merged, value_cols)
+    manifest['version'] = version
+    _commit(root, manifest)
+    print(f"✔ Feature store updated with {len(new_rows)} rows (version {version})")
+    return True
+
+
+def _downcast(values, dtype):
+    """`values` as `dtype`, downcast to float32 / int32 (when every value fits)."""
+    kind = np.dtype(dtype).kind
+    if kind == 'f':
+        return values.astype(np.float32)
+    if kind in 'iu':
+        if len(values) and (values.min() < INT32.min or values.max() > INT32.max):
+            return values.astype(dtype)
+        return values.astype(np.int32)
+    return values.astype(dtype)
+
+
+def compact_frame(df):
+    """Downcast a frame in place: floats to float32, integers to int32 where they fit, symbol to category."""
+    for c in df.columns:
+        if c != 'date' and df[c].dtype.kind in 'fiu':
+            df[c] = _downcast(df[c].to_numpy(), df[c].dtype)
+    if 'symbol' in df.columns:
+        df['symbol'] = df['symbol'].astype('category')
+    return df
+
+
+def read_store(columns=None, start=None, end=None, symbols=None, root=STORE_DIR, manifest=None,
+               compact=True):
+    """
+    Read the store with projection pushed down: only `columns` are paged in,
+    only year files overlapping [start, end) are opened and only the row
+    ranges of `symbols` inside them are sliced. Returns None if there is no store.
+    """
+    manifest = manifest or load_manifest(root)
+    if manifest is None:
+        return None
+    value_cols = manifest['columns']
+    wanted = value_cols if columns is None else [c for c in columns if c in value_cols]
+    col_idx = [value_cols.index(c) for c in wanted]
+    lo = np.datetime64(pd.Timestamp(start), 'ns').astype(np.int64) if start is not None else None
+    hi = np.datetime64(pd.Timestamp(end), 'ns').astype(np.int64) if end is not None else None
+
+    parts = []
+    for year, part in sorted(manifest['years'].items()):
+        y = int(year)
+        if (start is not None and y < pd.Timestamp(start).year) or \
+                (end is not None and pd.Timestamp(year=y, month=1, day=1) >= pd.Timestamp(end)):
+            continue
+        ranges = part['symbols'] if symbols is None else \
+            {s: part['symbols'][s] for s in symbols if s in part['symbols']}
+        if ranges:
+            parts.append((part, ranges))
+    categories = sorted({s for _, ranges in parts for s in ranges})
+    code_of = {s: k for k, s in enumerate(categories)}
+
+    # Each year is cast to the output dtypes before the next one is paged in
+    code_parts, date_parts, value_parts = [], [], {c: [] for c in wanted}
+    for part, ranges in parts:
+        base = os.path.join(root, part['path'])
+        values = np.load(os.path.join(base, 'values.npy'), mmap_mode='r')
+        dates = np.load(os.path.join(base, 'date.npy'), mmap_mode='r')
+        bounds = np.array(list(ranges.values()), dtype=np.int64).reshape(-1, 2)
+        codes = np.repeat(np.array([code_of[s] for s in ranges], dtype=np.int32),
+                          bounds[:, 1] - bounds[:, 0])
+        if symbols is None:
+            rows = slice(0, part['rows'])
+        else:
+            rows = np.concatenate([np.arange(a, b) for a, b in bounds])
+        d = np.asarray(dates[rows])
+        if lo is not None or hi is not None:
+            keep = np.ones(len(d), dtype=bool)
+            if lo is not None:
+                keep &= d >= lo
+            if hi is not None:
+                keep &= d < hi
+            # Page in only the rows inside the date range
+            rows = np.flatnonzero(keep) if isinstance(rows, slice) else rows[keep]
+            codes, d = codes[keep], d[keep]
+        v = np.asarray(values[np.ix_(col_idx, rows)] if not isinstance(rows, slice)
+                       else values[col_idx])
+        code_parts.append(codes)
+        date_parts.append(d)
+        for k, c in enumerate(wanted):
+            dtype = manifest['dtypes'][c]
+            value_parts[c].append(_downcast(v[k], dtype) if compact else v[k].astype(dtype))
+        del v
+
+    symbol = pd.Categorical.from_codes(
+        np.concatenate(code_parts) if code_parts else np.array([], dtype=np.int32), categories)
+    out = pd.DataFrame({
+        'symbol': symbol.remove_unused_categories() if compact else np.asarray(symbol, dtype=object),
+        'date': (np.concatenate(date_parts) if date_parts else np.array([], dtype=np.int64))
+        .view('datetime64[ns]'),
+    })
+    for c in wanted:
+        out[c] = np.concatenate(value_parts.pop(c)) if date_parts else \
+            np.array([], dtype=manifest['dtypes'][c])
+    if columns is not None:
+        out = out[[c for c in columns if c in out.columns]]
+    return out
+
+
+def _add_returns(df, compact=True):
+    """Per-symbol next-bar return `target` and previous-bar return `ret`; rows must be in date order per symbol."""
+    close = df['C'].to_numpy(dtype=np.float64)
+    by_symbol = pd.Series(close, index=df.index).groupby(df['symbol'].to_numpy(), sort=False)
+    dtype = np.float32 if compact else np.float64
+    df['target'] = (by_symbol.shift(-1).to_numpy() / close - 1).astype(dtype)
+    df['ret'] = (close / by_symbol.shift(1).to_numpy() - 1).astype(dtype)
+    return df
+
+
+def _read_sql(engine, columns, start, end, symbols, compact=True, chunksize=CHUNK_ROWS,
+              returns=False):
+    q = lambda name: quote(engine, name)
+    cols = ', '.join(q(c) for c in columns) if columns is not None else '*'
+    if returns:
+        # Per-symbol returns as window functions, evaluated by the database
+        w = f"OVER (PARTITION BY {q('symbol')} ORDER BY {q('date')})"
+        cols += (f", LEAD({q('C')}) {w} / {q('C')} - 1 AS target"
+                 f", {q('C')} / LAG({q('C')}) {w} - 1 AS ret")
+    where, params = [], {}
+    if start is not None:
+        where.append("date >= :start")
+        params['start'] = pd.Timestamp(start).to_pydatetime()
+    if end is not None:
+        where.append("date < :end")
+        params['end'] = pd.Timestamp(end).to_pydatetime()
+    if symbols is not None:
+        where.append("symbol IN :symbols")
+        params['symbols'] = list(symbols)
+    sql = f"SELECT {cols} FROM daily_features" + (" WHERE " + " AND ".join(where) if where else "")
+    query = text(sql)
+    if symbols is not None:
+        query = query.bindparams(bindparam('symbols', expanding=True))
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True)
+        chunks = [compact_frame(chunk) if compact else chunk
+                  for chunk in pd.read_sql(query, conn, params=params, parse_dates=['date'],
+                                           chunksize=chunksize)]
+        if not chunks:
+            return pd.read_sql(query, conn, params=params, parse_dates=['date'])
+    if compact:
+        categories = sorted(set().union(*(c['symbol'].cat.categories for c in chunks)))
+        for c in chunks:
+            c['symbol'] = c['symbol'].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def date_counts(engine=None):
+    """Rows of daily_features per date, in date order (counted by the database)."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT date, COUNT(*) FROM daily_features GROUP BY date ORDER BY date"))
+        out = pd.DataFrame(rows.fetchall(), columns=['date', 'rows'])
+    out['date'] = pd.to_datetime(out['date'])
+    return out
+
+
+def iter_features(columns=None, symbols=None, engine=None, root=STORE_DIR, compact=True):
+    """
+    daily_features one calendar year at a time, each frame sorted by
+    (symbol, date): year files of the store when it is current, otherwise one
+    SQL query per year. Aggregating over the frames needs only one year of
+    rows in memory, and every date is complete within its frame.
+    """
+    engine = engine or get_engine()
+    if columns is not None:
+        columns = list(dict.fromkeys(['symbol', 'date'] + list(columns)))
+    manifest = load_manifest(root)
+    if manifest is not None and manifest['version'] == data_version(engine):
+        years = sorted(int(y) for y in manifest['years'])
+        source = 'read:feature_store'
+
+        def read(start, end):
+            return read_store(columns, start, end, symbols, root, manifest, compact)
+    else:
+        print("Feature store missing or stale, reading daily_features from the database")
+        with engine.connect() as conn:
+            first, last = conn.execute(text("SELECT MIN(date), MAX(date) FROM daily_features")).one()
+        years = [] if first is None else range(pd.Timestamp(first).year, pd.Timestamp(last).year + 1)
+        source = 'read:daily_features'
+
+        def read(start, end):
+            df = _read_sql(engine, columns, start, end, symbols, compact)
+            return df.sort_values(['symbol', 'date'], kind='mergesort', ignore_index=True)
+    for year in years:
+        with telemetry.span(source, 'read', year=year) as s:
+            df = read(pd.Timestamp(year=year, month=1, day=1), pd.Timestamp(year=year + 1, month=1, day=1))
+            s.rows = len(df)
+        if len(df):
+            yield df
+
+
+def read_features(columns=None, start=None, end=None, symbols=None, engine=None, root=STORE_DIR,
+                  compact=True, returns=False):
+    """
+    daily_features rows restricted to `columns`, `symbols` and dates in
+    [start, end), sorted by (date, symbol). Served from the feature store when
+    its version matches the database, otherwise queried from SQL. With
+    compact=False values keep their stored dtypes and `symbol` is object.
+
+    returns=True adds each symbol's next-bar return `target` (NaN on its last
+    bar in range) and previous-bar return `ret` (NaN on its first), computed
+    with LEAD/LAG window functions in SQL or grouped shifts over the store.
+    """
+    engine = engine or get_engine()
+    if columns is not None:
+        columns = list(dict.fromkeys(['symbol', 'date'] + list(columns)
+                                     + (['C'] if returns else [])))
+    manifest = load_manifest(root)
+    if manifest is not None and manifest['version'] == data_version(engine):
+        with telemetry.span('read:feature_store', 'read') as s:
+            df = read_store(columns, start, end, symbols, root, manifest, compact)
+            if returns:
+                _add_returns(df, compact)
+            s.rows = len(df)
+    else:
+        print("Feature store missing or stale, reading daily_features from the database")
+        with telemetry.span('read:daily_features', 'read') as s:
+            df = _read_sql(engine, columns, start, end, symbols, compact, returns=returns)
+            s.rows = len(df)
+    return df.sort_values(['date', 'symbol'], kind='mergesort', ignore_index=True)
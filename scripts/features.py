@@ -1,31 +1,306 @@
 # scripts/features.py
+import json
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
-from config import DATABASE_URL
-from ta.momentum import RSIIndicator
-from ta.trend import SMAIndicator
+from sqlalchemy import (text, inspect, bindparam, MetaData, Table, Column,
+                        String, DateTime, Integer, Text)
+from scripts.db import (get_engine, create_index, quote, replace_table, upsert_stmt, write_frame,
+                        writer_processes)
+from scripts.shards import run_sharded
+from scripts import bar_store, telemetry
+from scripts.indicators import compute_indicators, group_offsets, EwmState, LOOKBACK
+from scripts.feature_store import data_version, load_manifest, write_store, update_store
 
-def build_features():
-    engine = create_engine(DATABASE_URL, echo=False)
+# Indicator columns materialized into daily_features (see scripts.indicators.INDICATORS)
+FEATURE_INDICATORS = ['rsi_14', 'sma_20']
+OHLCV = ['symbol', 'date', 'O', 'H', 'L', 'C', 'V']
 
-    df = pd.read_sql("SELECT * FROM daily_ohlcv", engine, parse_dates=['date'])
+metadata = MetaData()
 
-    df.sort_values(['symbol', 'date'], inplace=True)
+# Where each symbol's materialized features end, and what is needed to extend them:
+# the first date of its last LOOKBACK bars plus the recursive-average values at last_date.
+feature_state = Table(
+    'feature_state', metadata,
+    Column('symbol', String(16), primary_key=True),
+    Column('last_date', DateTime),
+    Column('n_bars', Integer),
+    Column('context_start', DateTime),
+    Column('state', Text),
+)
 
-    df['rsi_14'] = df.groupby('symbol').apply(
-        lambda grp: RSIIndicator(close=grp['C'], window=14).rsi()
-    ).reset_index(level=0, drop=True)
 
-    df['sma_20'] = df.groupby('symbol').apply(
-        lambda grp: SMAIndicator(close=grp['C'], window=20).sma_indicator()
-    ).reset_index(level=0, drop=True)
+def _state_rows(df, indicators, state, bars=None):
+    offsets = group_offsets(df['symbol'].to_numpy())
+    last = offsets[1:] - 1
+    first_ctx = np.maximum(offsets[1:] - LOOKBACK, offsets[:-1])
+    dates = df['date'].to_numpy()
+    symbols = df['symbol'].to_numpy()
+    rows = []
+    for g in range(len(offsets) - 1):
+        ewm = {k: float(v[g]) for k, v in state.final.items()}
+        rows.append({'symbol': symbols[last[g]],
+                     'last_date': pd.Timestamp(dates[last[g]]).to_pydatetime(),
+                     'n_bars': int(offsets[g + 1] - offsets[g]),
+                     'context_start': pd.Timestamp(dates[first_ctx[g]]).to_pydatetime(),
+                     'state': json.dumps({'columns': list(indicators), 'bars': bars, 'ewm': ewm})})
+    return rows
 
-    df.to_sql('daily_features', engine, if_exists='replace', index=False)
-    print("✔ daily_features table created with columns:")
+
+def _with_indicators(df, indicators, state):
+    ind = compute_indicators(df, indicators, state)
+    for col in ind.columns:
+        df[col] = ind[col]
+    return df
+
+
+def _read_ohlcv(engine, symbols=None, start=None, bars=None):
+    """
+    OHLCV of `symbols` (None: every symbol, read without a symbol filter)
+    from `start` on, sorted by (symbol, date): daily bars from daily_ohlcv,
+    or with `bars` (e.g. '15min') the bar store resampled to that frequency.
+    `start` may be a dict of each symbol's own start; symbols missing from
+    it are then left out.
+    """
+    per_symbol = start if isinstance(start, dict) else None
+    if per_symbol is not None:
+        start = min(per_symbol.values()) if per_symbol else None
+    if bars is not None:
+        with telemetry.span('read:bar_store', 'read') as s:
+            wanted = bar_store.symbols() if symbols is None else symbols
+            if per_symbol is not None:
+                wanted = [s for s in wanted if s in per_symbol]
+            df = bar_store.read_bars(wanted, bars, per_symbol or start, complete_only=True)[OHLCV]
+            s.rows = len(df)
+        return df
+    cols = ', '.join(quote(engine, c) for c in OHLCV)
+    where, params = [], {}
+    if symbols is not None:
+        where.append("symbol IN :symbols")
+        params['symbols'] = list(symbols)
+    if start is not None:
+        where.append("date >= :start")
+        params['start'] = start.to_pydatetime()
+    query = text(f"SELECT {cols} FROM daily_ohlcv" + (" WHERE " + " AND ".join(where) if where else ""))
+    if symbols is not None:
+        query = query.bindparams(bindparam('symbols', expanding=True))
+    with telemetry.span('read:daily_ohlcv', 'read') as s:
+        df = pd.read_sql(query, engine, params=params, parse_dates=['date'])
+        if per_symbol is not None:
+            df = df[(df['date'] >= df['symbol'].map(per_symbol)).to_numpy()]
+        s.rows = len(df)
+    df.sort_values(['symbol', 'date'], inplace=True, ignore_index=True)
+    return df
+
+
+def _last_bars(engine, symbols=None, bars=None):
+    """Date of each symbol's newest OHLCV bar (of `symbols`, or every symbol)."""
+    if bars is not None:
+        return {s: bar_store.last_bar(s)
+                for s in (bar_store.symbols() if symbols is None else symbols)}
+    query = "SELECT symbol, MAX(date) FROM daily_ohlcv"
+    params = {}
+    if symbols is not None:
+        query += " WHERE symbol IN :symbols"
+        params['symbols'] = list(symbols)
+    query = text(query + " GROUP BY symbol")
+    if symbols is not None:
+        query = query.bindparams(bindparam('symbols', expanding=True))
+    with engine.connect() as conn:
+        return {r[0]: pd.Timestamp(r[1]) for r in conn.execute(query, params)}
+
+
+def _rebuild_symbols(symbols, indicators, create=False, bars=None):
+    """
+    Compute one shard's features (None: every symbol) into
+    daily_features_new; runs in a worker when sharded.
+    """
+    engine = get_engine()
+    state = EwmState()
+    df = _with_indicators(_read_ohlcv(engine, symbols, bars=bars), indicators, state)
+    with engine.begin() as conn:
+        write_frame(conn, df, 'daily_features_new', create=create)
+    return df, _state_rows(df, indicators, state, bars)
+
+
+def _symbols(engine, bars=None):
+    if bars is not None:
+        return bar_store.symbols()
+    with engine.connect() as conn:
+        return sorted(r[0] for r in conn.execute(text("SELECT DISTINCT symbol FROM daily_ohlcv")))
+
+
+def _full_rebuild(engine, indicators, workers=1, bars=None):
+    symbols = _symbols(engine, bars)
+    # Build into a side table and swap it in, so readers never see daily_features missing
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS daily_features_new;"))
+    if workers > 1 and len(symbols) > 1:
+        # The first symbol creates the side table; the shards then append to it concurrently
+        parts = [_rebuild_symbols(symbols[:1], indicators, create=True, bars=bars)]
+        parts += run_sharded(_rebuild_symbols, symbols[1:], workers, label='features',
+                             indicators=indicators, bars=bars)
+    else:
+        parts = [_rebuild_symbols(None, indicators, create=True, bars=bars)]
+    df = pd.concat([p[0] for p in parts], ignore_index=True)
+    df.sort_values(['symbol', 'date'], inplace=True, ignore_index=True)
+    rows = sorted((r for p in parts for r in p[1]), key=lambda r: r['symbol'])
+
+    exists = inspect(engine).has_table('daily_features')
+    with engine.begin() as conn:
+        replace_table(conn, 'daily_features_new', 'daily_features', exists)
+        create_index(conn, 'daily_features', 'idx_feat_sym_date', ['symbol', 'date'],
+                     prefixes={'symbol': 16})
+
+        feature_state.drop(conn, checkfirst=True)
+        feature_state.create(conn)
+        if rows:
+            conn.execute(feature_state.insert(), rows)
+
+    print("✔ daily_features table rebuilt with columns:")
     print("  ", df.columns.tolist())
+    return df
 
+
+def _load_state(engine, indicators, bars=None):
+    """Per-symbol state, or None when an incremental run is not possible."""
+    insp = inspect(engine)
+    if not (insp.has_table('daily_features') and insp.has_table('feature_state')):
+        return None
     with engine.connect() as conn:
-        conn.execute(text("ALTER TABLE daily_features ADD INDEX idx_feat_sym_date (symbol(16), date);"))
+        rows = conn.execute(feature_state.select()).fetchall()
+    if not rows:
+        return None
+    state = {}
+    for r in rows:
+        blob = json.loads(r.state)
+        if blob['columns'] != list(indicators) or blob.get('bars') != bars:
+            return None
+        state[r.symbol] = {'last_date': pd.Timestamp(r.last_date), 'n_bars': r.n_bars,
+                           'context_start': pd.Timestamp(r.context_start), 'ewm': blob['ewm']}
+    return state
+
+
+def _extend_symbols(symbols, indicators, state, bars=None):
+    """
+    Append features for one shard's new bars (runs in a worker when sharded;
+    symbols=None is the whole universe, read without a symbol filter).
+    Returns the appended rows, or None when the shard needs a full rebuild.
+    """
+    engine = get_engine()
+    universe = symbols is None
+    last_bars = _last_bars(engine, symbols, bars)
+    symbols = sorted(last_bars)
+    # Only symbols with bars past their features are read, each from its own context, so a
+    # stale or delisted symbol doesn't drag every other symbol's read back to its old dates
+    known = [s for s in symbols if s in state and last_bars[s] is not None
+             and last_bars[s] > state[s]['last_date']]
+    fresh = [s for s in symbols if s not in state]
+
+    parts = []
+    if known:
+        starts = {s: state[s]['context_start'] for s in known}
+        parts.append(_read_ohlcv(engine, None if universe else known, starts, bars))
+    if fresh:
+        parts.append(_read_ohlcv(engine, fresh, bars=bars))
+    if not parts:
+        return pd.DataFrame()
+    df = pd.concat(parts, ignore_index=True)
+    df.sort_values(['symbol', 'date'], inplace=True, ignore_index=True)
+
+    last_date = df['symbol'].map({s: v['last_date'] for s, v in state.items()})
+    is_new = last_date.isna() | (df['date'] > last_date)
+    touched = df.loc[is_new, 'symbol'].unique()
+    df = df[df['symbol'].isin(touched)]
+    if df.empty:
+        return pd.DataFrame()
+
+    # Symbols with a full LOOKBACK of context resume from their saved averages;
+    # new or short-history symbols are recomputed from their (short) full history.
+    resumable = {s for s in touched if s in state and state[s]['n_bars'] >= LOOKBACK}
+    context = (~is_new[df.index]).groupby(df['symbol']).sum()
+    bad = [s for s in resumable if context[s] != LOOKBACK]
+    if bad or any(context.get(s, 0) != state[s]['n_bars'] for s in touched
+                  if s in state and s not in resumable):
+        print(f"History changed under existing features ({len(bad)} symbols)")
+        return None
+
+    frames, states = [], []
+    mask = df['symbol'].isin(resumable)
+    if mask.any():
+        part = df[mask].copy()
+        order = part['symbol'].unique()
+        keys = state[order[0]]['ewm'].keys()
+        st = EwmState(seed_col=LOOKBACK - 1,
+                      seeds={k: np.array([state[s]['ewm'][k] for s in order]) for k in keys})
+        frames.append(_with_indicators(part, indicators, st))
+        states.append((frames[-1], st))
+    if (~mask).any():
+        st = EwmState()
+        frames.append(_with_indicators(df[~mask].copy(), indicators, st))
+        states.append((frames[-1], st))
+
+    new_rows = pd.concat(frames).loc[lambda f: is_new[f.index]]
+    state_rows = [row for part, st in states for row in _state_rows(part, indicators, st, bars)]
+    for row in state_rows:
+        prev = state.get(row['symbol'])
+        if prev is not None and row['symbol'] in resumable:
+            row['n_bars'] += prev['n_bars'] - LOOKBACK
+
+    with engine.begin() as conn:
+        write_frame(conn, new_rows, 'daily_features')
+        conn.execute(upsert_stmt(feature_state, conn.dialect.name, ['symbol']), state_rows)
+    return new_rows
+
+
+def _incremental(engine, indicators, state, workers=1, bars=None):
+    if workers > 1:
+        parts = run_sharded(_extend_symbols, _symbols(engine, bars), workers, label='features',
+                            indicators=indicators, state=state, bars=bars)
+    else:
+        parts = [_extend_symbols(None, indicators, state, bars)]
+    if any(p is None for p in parts):
+        print("Falling back to a full rebuild")
+        return None
+    new_rows = [p for p in parts if not p.empty]
+    if not new_rows:
+        print("✔ daily_features already up to date")
+        return pd.DataFrame()
+    new_rows = pd.concat(new_rows).sort_values(['symbol', 'date'], ignore_index=True)
+    print(f"✔ Appended {len(new_rows)} feature rows for {new_rows['symbol'].nunique()} symbols")
+    return new_rows
+
+
+def build_features(indicators=FEATURE_INDICATORS, full_rebuild=False, workers=1, bars=None):
+    """
+    Materialize daily_features from daily_ohlcv, or with `bars` (a pandas
+    frequency such as '5min', '1h' or '1D') from the intraday bar store
+    resampled to that frequency; switching source forces a full rebuild.
+
+    By default only bars newer than each symbol's last materialized date are
+    computed and appended, resuming indicator state saved in feature_state;
+    the result is identical to a full rebuild. `full_rebuild=True` (or missing
+    / incompatible state) recomputes all history and swaps the table in.
+    The columnar feature store is brought to the same data version.
+    `workers` > 1 computes and writes shards of symbols in separate processes.
+    """
+    engine = get_engine()
+    workers = writer_processes(engine, workers)
+    prev_version = data_version(engine)
+    state = None if full_rebuild else _load_state(engine, indicators, bars)
+    new_rows = _incremental(engine, indicators, state, workers, bars) if state is not None else None
+    if new_rows is None:
+        write_store(_full_rebuild(engine, indicators, workers, bars), data_version(engine))
+        return
+
+    version = data_version(engine)
+    manifest = load_manifest()
+    if manifest is not None and manifest['version'] == version:
+        return
+    if new_rows.empty or not update_store(new_rows, version, prev_version):
+        with telemetry.span('read:daily_features', 'read') as s:
+            df = pd.read_sql("SELECT * FROM daily_features", engine, parse_dates=['date'])
+            s.rows = len(df)
+        write_store(df, version)
 
 # if __name__ == "__main__":
 #     build_features()
@@ -2,12 +2,121 @@
 import time
 import os
 import io
+import re
+import json
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import requests
 import pandas as pd
-import argparse
+from requests.adapters import HTTPAdapter
 from config import ALPHA_VANTAGE_API_KEY, BASE_URL
 
-def fetch_data(symbol: str, function: str, interval: str, outputsize: str) -> pd.DataFrame:
+CACHE_DIR = os.path.join('data', 'raw', '.cache')
+# Alpha Vantage's compact output is the latest 100 bars
+COMPACT_BARS = 100
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Wording of Alpha Vantage's rate-limit messages ("... API call frequency is 5 calls per
+# minute", "... rate limit is 25 requests per day"); other messages are permanent errors
+RATE_LIMITED = re.compile(r'call frequency|rate limit|(calls|requests) per (minute|day)', re.I)
+
+
+class Throttled(Exception):
+    """The API asked us to slow down (HTTP 429/5xx or a rate-limit 'Note'/'Information' body)."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` calls per minute with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(pool_size=8):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _cache_path(cache_dir, params):
+    key = json.dumps({k: v for k, v in sorted(params.items()) if k != 'apikey'})
+    return os.path.join(cache_dir, hashlib.sha256(key.encode()).hexdigest()[:32] + '.csv')
+
+
+def _get(session, base_url, params, bucket, timeout):
+    if bucket is not None:
+        bucket.acquire()
+    resp = session.get(base_url, params=params, timeout=timeout)
+    if resp.status_code in RETRY_STATUS:
+        raise Throttled(f"HTTP {resp.status_code}")
+    resp.raise_for_status()
+    body = resp.text
+    # Throttling and errors come back as HTTP 200 with a JSON body instead of CSV.
+    # Only rate limiting is worth retrying; an invalid key or premium endpoint fails at once
+    if body.lstrip().startswith('{'):
+        msg = json.loads(body)
+        text = msg.get('Error Message') or msg.get('Note') or msg.get('Information') or body[:200]
+        if 'Error Message' not in msg and RATE_LIMITED.search(text):
+            raise Throttled(text)
+        raise ValueError(f"{params['symbol']}: {text}")
+    return body
+
+
+def request_csv(params, session=None, bucket=None, base_url=BASE_URL, retries=5,
+                backoff=2.0, cache_dir=CACHE_DIR, cache_ttl=12 * 3600, timeout=30):
+    """
+    CSV body for one API call: served from the on-disk cache when younger than
+    `cache_ttl` seconds, otherwise fetched through the rate limiter with
+    exponential backoff (plus jitter) on throttling and transient errors.
+    """
+    path = _cache_path(cache_dir, params) if cache_dir else None
+    if path and os.path.isfile(path) and time.time() - os.path.getmtime(path) < cache_ttl:
+        with open(path) as f:
+            return f.read()
+
+    session = session or requests
+    for attempt in range(retries + 1):
+        try:
+            body = _get(session, base_url, params, bucket, timeout)
+            break
+        except (Throttled, requests.ConnectionError, requests.Timeout) as exc:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * (1 + random.random())
+            print(f"  {params['symbol']}: {exc}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(body)
+        os.replace(tmp, path)
+    return body
+
+
+def fetch_data(symbol: str, function: str, interval: str, outputsize: str, **kwargs) -> pd.DataFrame:
     params = {
         "function": function,
         "symbol": symbol,
@@ -18,9 +127,8 @@ def fetch_data(symbol: str, function: str, interval: str, outputsize: str) -> pd
     if function == "TIME_SERIES_INTRADAY":
         params["interval"] = interval
 
-    resp = requests.get(BASE_URL, params=params)
-    resp.raise_for_status()
-    df = pd.read_csv(io.StringIO(resp.text), parse_dates=['timestamp'])
+    text = request_csv(params, **kwargs)
+    df = pd.read_csv(io.StringIO(text), parse_dates=['timestamp'])
     df.rename(columns={
         'timestamp': 'date',
         'open':      'O',
@@ -30,6 +138,59 @@ def fetch_data(symbol: str, function: str, interval: str, outputsize: str) -> pd
         'volume':    'V'
     }, inplace=True)
     return df
+
+
+def _existing(path, function):
+    """Existing raw CSV if a compact (latest 100 bars) response would cover the gap to today."""
+    if function != 'TIME_SERIES_DAILY' or not os.path.isfile(path):
+        return None
+    old = pd.read_csv(path, parse_dates=['date'])
+    if old.empty:
+        return None
+    gap = np.busday_count(old['date'].max().date(), pd.Timestamp.today().date())
+    return old if gap < COMPACT_BARS - 5 else None
+
+
+def fetch_symbol(sym, function, interval, outputsize, datadir, **kwargs):
+    """Fetch one symbol into datadir/<sym>.csv, merging a compact response into the existing file."""
+    path = os.path.join(datadir, f"{sym}.csv")
+    old = _existing(path, function) if outputsize == 'full' else None
+    size = 'compact' if old is not None else outputsize
+    df = fetch_data(sym, function, interval, size, **kwargs)
+    if old is not None:
+        df = (pd.concat([df, old]).drop_duplicates('date', keep='first')
+              .sort_values('date', ascending=False))
+    tmp = path + '.tmp'
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return size, len(df)
+
+
+def fetch_all(symbols, function='TIME_SERIES_DAILY', interval='60min', outputsize='full',
+              datadir='data/raw', rate=5, burst=1, workers=4, **kwargs):
+    """Fetch `symbols` with up to `workers` requests in flight, sharing one rate limit."""
+    os.makedirs(datadir, exist_ok=True)
+    bucket = TokenBucket(rate, burst)
+    session = make_session(workers)
+    started = time.perf_counter()
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_symbol, sym, function, interval, outputsize, datadir,
+                               session=session, bucket=bucket, **kwargs): sym
+                   for sym in symbols}
+        for fut in as_completed(futures):
+            sym = futures[fut]
+            try:
+                size, rows = fut.result()
+                print(f"Fetched {sym} ({size}, {rows} rows)")
+            except Exception as exc:
+                failed.append(sym)
+                print(f"Failed {sym}: {exc}")
+    print(f"Fetched {len(symbols) - len(failed)}/{len(symbols)} symbols "
+          f"in {time.perf_counter() - started:.1f}s")
+    return failed
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-s','--symbols', nargs='+', required=True,
@@ -38,15 +199,24 @@ def main():
     parser.add_argument('-i','--interval', default='60min')
     parser.add_argument('-o','--outputsize', default='full')
     parser.add_argument('-d','--datadir', default='data/raw')
+    parser.add_argument('--rate', type=float, default=5,
+                        help='API calls per minute allowed by your plan.')
+    parser.add_argument('--burst', type=int, default=1,
+                        help='Calls that may be made back to back before the rate applies.')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent requests in flight.')
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--cache-ttl', type=float, default=12 * 3600,
+                        help='Seconds a cached response stays fresh (0 disables reuse).')
     args = parser.parse_args()
 
-    os.makedirs(args.datadir, exist_ok=True)
-    for sym in args.symbols:
-        print(f"Fetching {sym}…")
-        df = fetch_data(sym, args.function, args.interval, args.outputsize)
-        path = os.path.join(args.datadir, f"{sym}.csv")
-        df.to_csv(path, index=False)
-        time.sleep(12)  # 避免 API 限频
+    failed = fetch_all(args.symbols, args.function, args.interval, args.outputsize, args.datadir,
+                       rate=args.rate, burst=args.burst, workers=args.workers,
+                       retries=args.retries, base_url=args.base_url,
+                       cache_dir=args.cache_dir, cache_ttl=args.cache_ttl)
+    if failed:
+        raise SystemExit(f"Failed to fetch: {' '.join(failed)}")
 
 if __name__ == '__main__':
     main()
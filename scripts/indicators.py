@@ -0,0 +1,268 @@
+# scripts/indicators.py
+"""
+Vectorized technical indicators for many symbols at once.
+
+Every function works on flat NumPy arrays sorted by (symbol, date) together with
+`offsets`, the start index of each symbol's block (plus a final entry equal to
+the array length). Recursive averages run through `scipy.signal.lfilter` on a
+(symbols x bars) padded matrix, rolling windows are summed with shifted slices,
+so there is no Python-level work per symbol.
+
+Values follow the `ta` library definitions; the only intended difference is that
+ATR is NaN (not 0) during its warm-up window.
+
+Passing an `EwmState` lets a run resume from saved recursive-average values
+instead of replaying full history, with results bit-for-bit identical to a
+full computation as long as each group carries `LOOKBACK` bars of context.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+# Bars of history that must precede new bars when resuming from an EwmState;
+# covers the longest rolling window / warm-up of every indicator below.
+LOOKBACK = 64
+
+
+class EwmState:
+    """
+    Recursive-average state carried between runs.
+
+    When `seed_col` is set every group's averages restart from `seeds[key]` at
+    that bar index (the last bar of its context). After a run `final[key]`
+    holds each average's value at the last bar of every group.
+    """
+
+    def __init__(self, seed_col=None, seeds=None):
+        self.seed_col = seed_col
+        self.seeds = seeds or {}
+        self.final = {}
+
+
+def group_offsets(symbols):
+    """Start offsets of each run of equal values in an already sorted array."""
+    symbols = np.asarray(symbols)
+    starts = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+    return np.concatenate(([0], starts, [len(symbols)])).astype(np.int64)
+
+
+@lru_cache(maxsize=4)
+def _cached_layout(key):
+    offsets = np.frombuffer(key, dtype=np.int64)
+    lengths = np.diff(offsets)
+    pos = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    width = int(lengths.max()) if len(lengths) else 0
+    pos.flags.writeable = False
+    rows.flags.writeable = False
+    return rows, pos, width
+
+
+def _layout(offsets):
+    # Indicators over one panel share the same layout, so build it once per offsets array
+    return _cached_layout(np.ascontiguousarray(offsets, dtype=np.int64).tobytes())
+
+
+def positions(offsets):
+    """Position of every row within its own group (0 for each group's first bar)."""
+    return _layout(offsets)[1]
+
+
+def to_matrix(values, offsets):
+    """Scatter a flat array into a NaN-padded (groups x max_length) matrix."""
+    rows, pos, width = _layout(offsets)
+    mat = np.full((len(offsets) - 1, width), np.nan)
+    mat[rows, pos] = values
+    return mat
+
+
+def from_matrix(mat, offsets):
+    rows, pos, _ = _layout(offsets)
+    return mat[rows, pos]
+
+
+def shift(values, offsets, periods=1):
+    """Per-group lag of `periods` bars (NaN where the lag crosses a group start)."""
+    out = np.full(len(values), np.nan)
+    out[periods:] = values[:-periods]
+    out[positions(offsets) < periods] = np.nan
+    return out
+
+
+def ewm_matrix(mat, alpha, seed_col=0, seed=None):
+    """
+    Recursive average y[t] = alpha * x[t] + (1 - alpha) * y[t-1] along axis 1.
+
+    Column `seed_col` is set to `seed` (default: the input value there) and the
+    recursion runs from the next column on; earlier columns are NaN.
+    """
+    out = np.full(mat.shape, np.nan)
+    if mat.shape[1] <= seed_col:
+        return out
+    seed = mat[:, seed_col] if seed is None else seed
+    out[:, seed_col] = seed
+    if mat.shape[1] > seed_col + 1:
+        zi = ((1.0 - alpha) * seed)[:, None]
+        out[:, seed_col + 1:], _ = lfilter([alpha, 0.0], [1.0, alpha - 1.0],
+                                           mat[:, seed_col + 1:], axis=1, zi=zi)
+    return out
+
+
+def _ewm(mat, alpha, offsets, state, key, seed_col=0, seed=None):
+    if state is not None and state.seed_col is not None:
+        seed_col, seed = state.seed_col, state.seeds[key]
+    out = ewm_matrix(mat, alpha, seed_col, seed)
+    if state is not None:
+        lengths = np.diff(offsets)
+        state.final[key] = out[np.arange(len(lengths)), lengths - 1]
+    return out
+
+
+def rolling_sum(values, offsets, window):
+    out = np.full(len(values), np.nan)
+    n = len(values) - window + 1
+    if n <= 0:
+        return out
+    # Adding shifted slices in a fixed order keeps results identical for any array length
+    acc = values[:n].copy()
+    for k in range(1, window):
+        acc += values[k:k + n]
+    out[window - 1:] = acc
+    out[positions(offsets) < window - 1] = np.nan
+    return out
+
+
+def rolling_mean(values, offsets, window):
+    return rolling_sum(values, offsets, window) / window
+
+
+def rolling_std(values, offsets, window, ddof=1):
+    out = np.full(len(values), np.nan)
+    n = len(values) - window + 1
+    if n <= 0:
+        return out
+    mean = rolling_mean(values, offsets, window)[window - 1:]
+    acc = np.zeros(n)
+    dev = np.empty(n)
+    for k in range(window):
+        np.subtract(values[k:k + n], mean, out=dev)
+        dev *= dev
+        acc += dev
+    out[window - 1:] = np.sqrt(acc / (window - ddof))
+    out[positions(offsets) < window - 1] = np.nan
+    return out
+
+
+def sma(close, offsets, window=20):
+    return rolling_mean(close, offsets, window)
+
+
+def ema(close, offsets, window=20, state=None):
+    alpha = 2.0 / (window + 1)
+    out = from_matrix(_ewm(to_matrix(close, offsets), alpha, offsets, state, f'ema_{window}'),
+                      offsets)
+    out[positions(offsets) < window - 1] = np.nan
+    return out
+
+
+def rsi(close, offsets, window=14, state=None):
+    diff = close - shift(close, offsets)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    alpha = 1.0 / window
+    avg_up = from_matrix(_ewm(to_matrix(up, offsets), alpha, offsets, state,
+                              f'rsi_up_{window}'), offsets)
+    avg_down = from_matrix(_ewm(to_matrix(down, offsets), alpha, offsets, state,
+                                f'rsi_down_{window}'), offsets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.where(avg_down == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_up / avg_down))
+    out[positions(offsets) < window - 1] = np.nan
+    return out
+
+
+def true_range(high, low, close, offsets):
+    prev_close = shift(close, offsets)
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr(high, low, close, offsets, window=14, state=None):
+    # Wilder smoothing seeded with the plain mean of the first `window` true ranges
+    tr = to_matrix(true_range(high, low, close, offsets), offsets)
+    if tr.shape[1] < window:
+        return np.full(len(close), np.nan)
+    seed = tr[:, :window].mean(axis=1)
+    return from_matrix(_ewm(tr, 1.0 / window, offsets, state, f'atr_{window}',
+                            window - 1, seed), offsets)
+
+
+def bollinger(close, offsets, window=20, window_dev=2):
+    mavg = rolling_mean(close, offsets, window)
+    mstd = rolling_std(close, offsets, window, ddof=0)
+    return mavg, mavg + window_dev * mstd, mavg - window_dev * mstd
+
+
+def macd(close, offsets, window_slow=26, window_fast=12, window_sign=9, state=None):
+    line = ema(close, offsets, window_fast, state) - ema(close, offsets, window_slow, state)
+    # The signal EMA starts at the first defined MACD value, as pandas' ewm does
+    mat = to_matrix(line, offsets)
+    signal = from_matrix(_ewm(mat, 2.0 / (window_sign + 1), offsets, state,
+                              f'macd_signal_{window_sign}', window_slow - 1), offsets)
+    signal[positions(offsets) < window_slow + window_sign - 2] = np.nan
+    return line, signal, line - signal
+
+
+def returns(close, offsets, periods=1):
+    return close / shift(close, offsets, periods) - 1.0
+
+
+def volatility(close, offsets, window=20):
+    ret = returns(close, offsets)
+    out = rolling_std(ret, offsets, window, ddof=1)
+    out[positions(offsets) < window] = np.nan
+    return out
+
+
+FAMILIES = {
+    'bollinger': lambda a: bollinger(a['C'], a['offsets'], 20, 2),
+    'macd':      lambda a: macd(a['C'], a['offsets'], 26, 12, 9, a['state']),
+}
+
+
+def _part(family, i):
+    # Multi-output indicators are computed once and shared by their columns
+    def column(a):
+        if family not in a:
+            a[family] = FAMILIES[family](a)
+        return a[family][i]
+    return column
+
+
+INDICATORS = {
+    'rsi_14':      lambda a: rsi(a['C'], a['offsets'], 14, a['state']),
+    'sma_20':      lambda a: sma(a['C'], a['offsets'], 20),
+    'ema_20':      lambda a: ema(a['C'], a['offsets'], 20, a['state']),
+    'atr_14':      lambda a: atr(a['H'], a['L'], a['C'], a['offsets'], 14, a['state']),
+    'bb_mavg_20':  _part('bollinger', 0),
+    'bb_hband_20': _part('bollinger', 1),
+    'bb_lband_20': _part('bollinger', 2),
+    'macd':        _part('macd', 0),
+    'macd_signal': _part('macd', 1),
+    'macd_diff':   _part('macd', 2),
+    'ret_1':       lambda a: returns(a['C'], a['offsets'], 1),
+    'vol_20':      lambda a: volatility(a['C'], a['offsets'], 20),
+}
+
+
+def compute_indicators(df, columns=None, state=None):
+    """
+    Compute `columns` (default: every entry of INDICATORS) for a frame sorted by
+    (symbol, date) holding H, L and C. Returns a frame aligned to `df.index`.
+    `state` is an optional EwmState to resume from and/or record into.
+    """
+    columns = list(INDICATORS) if columns is None else list(columns)
+    arrays = {c: df[c].to_numpy(dtype=np.float64) for c in ('H', 'L', 'C') if c in df}
+    arrays['offsets'] = group_offsets(df['symbol'].to_numpy())
+    arrays['state'] = state
+    return pd.DataFrame({c: INDICATORS[c](arrays) for c in columns}, index=df.index)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Load test for scripts/signal_server.py.
+
+Fires batched /score requests from concurrent clients for a fixed duration
+and reports client-side throughput and p50/p99 latency next to the server's
+own service-time percentiles from /stats.
+"""
+import time
+import argparse
+import threading
+
+import numpy as np
+import requests
+
+
+def client(url, payload, deadline, latencies, errors):
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            resp = session.post(url + '/score', json=payload, timeout=10)
+            resp.raise_for_status()
+        except requests.RequestException:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the signal server.")
+    parser.add_argument('--url', default='http://127.0.0.1:8765')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run.")
+    parser.add_argument('--batch', type=int, default=50, help="Symbols per request.")
+    parser.add_argument('--threshold', type=float, default=0.0)
+    args = parser.parse_args()
+
+    symbols = [s['symbol'] for s in
+               requests.post(args.url + '/score', json={}, timeout=30).json()['signals']]
+    payload = {'symbols': symbols[:args.batch], 'threshold': args.threshold}
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=client, args=(args.url, payload, deadline, latencies, errors))
+               for _ in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    lat = np.array(latencies) * 1000
+    print(f"{len(lat)} requests ({len(lat) / args.duration:.0f} req/s, "
+          f"{len(lat) * len(payload['symbols']) / args.duration:.0f} symbols/s), {len(errors)} errors")
+    if len(lat):
+        print(f"Client latency: p50 {np.percentile(lat, 50):.2f} ms, p99 {np.percentile(lat, 99):.2f} ms")
+    stats = requests.get(args.url + '/stats', timeout=10).json()
+    print(f"Server latency: p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms "
+          f"over {stats['requests']} requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+# scripts/model_registry.py
+"""
+Versioned model registry.
+
+Each trained model is an immutable version directory under REGISTRY_DIR:
+
+  models/registry/
+    20261017T043707-5ba9ccd1/
+      model.txt        LightGBM native model (Booster.save_model)
+      manifest.json    feature columns, params, training data version,
+                       CV score, trained_through, lineage
+    CURRENT            {"version": ..., "previous": [...]}
+
+Versions are written to a temporary directory and renamed into place, and
+CURRENT is replaced with a single rename, so promote and rollback are atomic
+for every reader. Loaded boosters are cached per process by version id,
+which is safe because a version never changes once written.
+
+  python -m scripts.model_registry list
+  python -m scripts.model_registry promote VERSION
+  python -m scripts.model_registry rollback
+  python -m scripts.model_registry import models/model.pkl
+  python -m scripts.model_registry bench
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+
+REGISTRY_DIR = os.path.join('models', 'registry')
+POINTER = 'CURRENT'
+MAX_PREVIOUS = 20
+# scripts.train.FEATURE_COLS, listed here so the registry doesn't import optuna: the
+# columns a legacy pickle was fit on when it was fit on unnamed arrays
+DEFAULT_FEATURE_COLS = ['O', 'H', 'L', 'C', 'V', 'rsi_14', 'sma_20']
+
+_boosters = {}
+_lock = threading.Lock()
+
+
+def _pointer(root):
+    path = os.path.join(root, POINTER)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, obj):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def current_version(root=REGISTRY_DIR):
+    """Id of the promoted version, or None when nothing has been promoted."""
+    pointer = _pointer(root)
+    return pointer['version'] if pointer else None
+
+
+def resolve(version=None, root=REGISTRY_DIR):
+    """`version` itself, or the current one when None; raises if neither exists."""
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No model promoted in {root}; run `python main.py train` first")
+    if not os.path.isdir(os.path.join(root, version)):
+        raise FileNotFoundError(f"Model version {version} not found in {root}")
+    return version
+
+
+def versions(root=REGISTRY_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(v for v in os.listdir(root)
+                  if os.path.isfile(os.path.join(root, v, 'manifest.json')))
+
+
+def manifest(version=None, root=REGISTRY_DIR):
+    with open(os.path.join(root, resolve(version, root), 'manifest.json')) as f:
+        return json.load(f)
+
+
+def load(version=None, root=REGISTRY_DIR):
+    """The lightgbm.Booster of `version` (default current), parsed once per process."""
+    version = resolve(version, root)
+    key = (os.path.abspath(root), version)
+    with _lock:
+        if key not in _boosters:
+            import lightgbm as lgb
+            _boosters[key] = lgb.Booster(model_file=os.path.join(root, version, 'model.txt'))
+        return _boosters[key]
+
+
+def register(booster, meta, root=REGISTRY_DIR):
+    """Store `booster` with its manifest `meta` as a new version and return its id."""
+    text = booster.model_to_string()
+    digest = hashlib.sha256(text.encode()).hexdigest()[:8]
+    version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{digest}"
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f".tmp-{version}")
+    os.makedirs(tmp)
+    with open(os.path.join(tmp, 'model.txt'), 'w') as f:
+        f.write(text)
+    meta = dict(meta, version=version, num_trees=booster.num_trees(),
+                created_at=datetime.now(timezone.utc).isoformat(timespec='seconds'))
+    _write_json(os.path.join(tmp, 'manifest.json'), meta)
+    os.rename(tmp, os.path.join(root, version))
+    return version
+
+
+def promote(version, root=REGISTRY_DIR):
+    """Point CURRENT at `version`, remembering the previous one for rollback."""
+    version = resolve(version, root)
+    pointer = _pointer(root) or {'version': None, 'previous': []}
+    if pointer['version'] == version:
+        return version
+    previous = ([pointer['version']] if pointer['version'] else []) + pointer['previous']
+    _write_json(os.path.join(root, POINTER), {'version': version,
+                                              'previous': previous[:MAX_PREVIOUS]})
+    print(f"Promoted model {version}")
+    return version
+
+
+def rollback(root=REGISTRY_DIR):
+    """Point CURRENT back at the previously promoted version."""
+    pointer = _pointer(root)
+    if not pointer or not pointer['previous']:
+        raise RuntimeError("No previous model version to roll back to")
+    version, previous = pointer['previous'][0], pointer['previous'][1:]
+    _write_json(os.path.join(root, POINTER), {'version': version, 'previous': previous})
+    print(f"Rolled back to model {version}")
+    return version
+
+
+def import_pickle(path, root=REGISTRY_DIR, feature_cols=None):
+    """
+    Register a legacy joblib-pickled LGBMRegressor (e.g. models/model.pkl).
+    Its feature columns are `feature_cols` if given, else the booster's own
+    names, unless those are LightGBM's Column_N placeholders (a model fit on
+    `.values`), which become DEFAULT_FEATURE_COLS.
+    """
+    import joblib
+    model = joblib.load(path)
+    booster = getattr(model, 'booster_', model)
+    params = model.get_params() if hasattr(model, 'get_params') else {}
+    names = booster.feature_name()
+    if feature_cols is None:
+        generic = names == [f"Column_{i}" for i in range(len(names))]
+        feature_cols = list(DEFAULT_FEATURE_COLS) if generic else names
+    if len(feature_cols) != len(names):
+        raise ValueError(f"{path} was fit on {len(names)} features but {len(feature_cols)} feature "
+                         f"columns were given ({', '.join(feature_cols)}); pass --feature-cols")
+    return register(booster, {'feature_cols': list(feature_cols), 'params': params,
+                              'imported_from': os.path.abspath(path)}, root)
+
+
+def bench(version=None, root=REGISTRY_DIR, pickle_path=None, repeat=5):
+    """Median load time of the native model file against unpickling the same model."""
+    import joblib
+    import tempfile
+    import lightgbm as lgb
+    version = resolve(version, root)
+    model_file = os.path.join(root, version, 'model.txt')
+
+    def timed(fn):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        return sorted(times)[len(times) // 2] * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if pickle_path is None:
+            pickle_path = os.path.join(tmp, 'model.pkl')
+            joblib.dump(lgb.Booster(model_file=model_file), pickle_path)
+        rows = [('joblib.load (pickle)', os.path.getsize(pickle_path),
+                 timed(lambda: joblib.load(pickle_path))),
+                ('Booster(model_file)', os.path.getsize(model_file),
+                 timed(lambda: lgb.Booster(model_file=model_file)))]
+        load(version, root)
+        rows.append(('registry.load (cached)', None, timed(lambda: load(version, root))))
+    print(f"Load latency of model {version} (median of {repeat}):")
+    for name, size, ms in rows:
+        size = f"{size / 1024:,.0f} KB" if size is not None else "-"
+        print(f"  {name:<24} {size:>10} {ms:>10.3f} ms")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and manage model versions.")
+    parser.add_argument('--root', default=REGISTRY_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="List versions; * marks the current one.")
+    p = sub.add_parser('promote', help="Make VERSION the current model.")
+    p.add_argument('version')
+    sub.add_parser('rollback', help="Return to the previously promoted model.")
+    p = sub.add_parser('import', help="Register (and promote) a pickled LGBMRegressor.")
+    p.add_argument('path')
+    p.add_argument('--feature-cols', nargs='+', default=None,
+                   help="Columns the model was fit on, in order (default: its feature names, or "
+                        f"{' '.join(DEFAULT_FEATURE_COLS)} when it was fit on unnamed arrays).")
+    p = sub.add_parser('bench', help="Compare native and pickle load latency.")
+    p.add_argument('--version')
+    p.add_argument('--pickle', help="Existing pickle to time (default: pickle of the same model).")
+    p.add_argument('--repeat', type=int, default=5)
+    p = sub.add_parser('remove', help="Delete a version that is not current.")
+    p.add_argument('version')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        current = current_version(args.root)
+        for v in versions(args.root):
+            m = manifest(v, args.root)
+            lineage = m.get('lineage', {})
+            cv = f"{m['cv_rmse']:.6f}" if m.get('cv_rmse') is not None else '-'
+            print(f"{'*' if v == current else ' '} {v}  cv_rmse {cv}  trees {m['num_trees']:>5}  "
+                  f"data {m.get('data_version', '-')}  {lineage.get('mode', '')} "
+                  f"{lineage.get('reason', '')}")
+    elif args.command == 'promote':
+        promote(args.version, args.root)
+    elif args.command == 'rollback':
+        rollback(args.root)
+    elif args.command == 'import':
+        promote(import_pickle(args.path, args.root, args.feature_cols), args.root)
+    elif args.command == 'bench':
+        bench(args.version, args.root, args.pickle, args.repeat)
+    elif args.command == 'remove':
+        version = resolve(args.version, args.root)
+        pointer = _pointer(args.root) or {'version': None, 'previous': []}
+        if version == pointer['version']:
+            raise SystemExit("Refusing to remove the current model; promote another first")
+        if version in pointer['previous']:
+            _write_json(os.path.join(args.root, POINTER),
+                        dict(pointer, previous=[v for v in pointer['previous'] if v != version]))
+        shutil.rmtree(os.path.join(args.root, version))
+        print(f"Removed model {version}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# scripts/out_of_core.py
+"""
+Training data for feature sets larger than RAM, sized by a memory budget.
+
+write_design_matrix() reads daily_features one window of dates at a time,
+with windows cut so a window's rows fit the budget. It appends the complete
+rows to X.npy / y.npy with plain file writes, so the full matrix only ever
+exists on disk. The .npy headers hold a fixed-width row count that is filled
+in at the end.
+
+RowRange is an lgb.Sequence over rows [start, stop) of X.npy. LightGBM
+samples rows from it to build its bins, then pushes it in batches of
+`batch_size` rows. Rows are read with np.fromfile rather than through a
+memory map, so pages already pushed don't stay resident.
+"""
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from scripts.feature_store import date_counts, read_features
+from scripts import telemetry
+
+# Peak bytes per row while a window is read and filtered: float64 slices of the
+# year files, the compact frame with returns, its sorted copy and the float32 rows
+READ_ROW_BYTES = 320
+# Rows LightGBM samples to find the bin boundaries
+BIN_SAMPLE_ROWS = 200_000
+# Read past each window's end so its last bars get their next-bar return
+# (the same margin backtest.predict_test reads before the test split)
+RETURN_MARGIN = pd.Timedelta(days=14)
+_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def budget_bytes(memory_budget_mb):
+    return int(memory_budget_mb * 1024 ** 2)
+
+
+def _header(dtype, shape):
+    # Row count padded to a fixed width, so the header can be rewritten in place
+    dims = ''.join(f' {s},' for s in shape[1:])
+    text = "{'descr': %r, 'fortran_order': False, 'shape': (%20d,%s), }" % (
+        np.lib.format.dtype_to_descr(np.dtype(dtype)), shape[0], dims)
+    text += ' ' * (-(len(_MAGIC) + 2 + len(text) + 1) % 64) + '\n'
+    return _MAGIC + struct.pack('<H', len(text)) + text.encode('latin1')
+
+
+def npy_layout(path):
+    """(header bytes, shape, dtype) of a C-ordered .npy file."""
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        read = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                else np.lib.format.read_array_header_2_0)
+        shape, fortran, dtype = read(f)
+        if fortran:
+            raise ValueError(f"{path} is Fortran-ordered")
+        return f.tell(), shape, dtype
+
+
+def read_rows(path, start, stop, layout=None, f=None):
+    """Rows [start, stop) of a .npy file, read without mapping it."""
+    offset, shape, dtype = layout or npy_layout(path)
+    width = int(np.prod(shape[1:]))
+    count = max(0, stop - start) * width
+    if f is None:
+        with open(path, 'rb') as f:
+            return read_rows(path, start, stop, (offset, shape, dtype), f)
+    f.seek(offset + start * width * dtype.itemsize)
+    return np.fromfile(f, dtype=dtype, count=count).reshape((-1,) + tuple(shape[1:]))
+
+
+def date_windows(counts, max_rows):
+    """Split per-date row counts into consecutive [lo, hi) date windows of about `max_rows` rows."""
+    cum = np.cumsum(counts['rows'].to_numpy())
+    dates = counts['date'].to_numpy()
+    windows, first, done = [], 0, 0
+    while first < len(dates):
+        # Always at least one date per window, even one larger than max_rows
+        last = max(first + 1, int(np.searchsorted(cum, done + max_rows, side='right')))
+        hi = pd.Timestamp(dates[last]) if last < len(dates) else None
+        windows.append((pd.Timestamp(dates[first]), hi))
+        done, first = cum[last - 1], last
+    return windows
+
+
+def write_design_matrix(feature_cols, cache_dir, memory_budget_mb):
+    """
+    Stream every complete daily_features row (features plus next-bar return
+    `target`) in (date, symbol) order, as train.load_data returns them, into
+    cache_dir/X.npy (float32) and y.npy (float64). Returns the number of rows
+    and the last date.
+    """
+    counts = date_counts()
+    windows = date_windows(counts, max(1, budget_bytes(memory_budget_mb) // READ_ROW_BYTES))
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = [os.path.join(cache_dir, 'X.npy'), os.path.join(cache_dir, 'y.npy')]
+    width = len(feature_cols)
+    rows, last_date = 0, None
+    with open(paths[0] + '.tmp', 'wb') as fx, open(paths[1] + '.tmp', 'wb') as fy:
+        fx.write(_header(np.float32, (0, width)))
+        fy.write(_header(np.float64, (0,)))
+        for lo, hi in windows:
+            df = read_features(feature_cols, start=lo, end=None if hi is None else hi + RETURN_MARGIN,
+                               returns=True)
+            keep = df[feature_cols + ['target']].notna().all(axis=1).to_numpy()
+            if hi is not None:
+                keep &= (df['date'] < hi).to_numpy()
+            with telemetry.span('write:design_matrix', 'write', rows=int(keep.sum())):
+                fx.write(df.loc[keep, feature_cols].to_numpy(dtype=np.float32).tobytes())
+                fy.write(df.loc[keep, 'target'].to_numpy(dtype=np.float64).tobytes())
+            if keep.any():
+                last_date = pd.Timestamp(df.loc[keep, 'date'].max())
+            rows += int(keep.sum())
+            del df, keep
+        for f, dtype, shape in ((fx, np.float32, (rows, width)), (fy, np.float64, (rows,))):
+            f.seek(0)
+            f.write(_header(dtype, shape))
+    for path in paths:
+        os.replace(path + '.tmp', path)
+    print(f"Design matrix streamed to {cache_dir}: {rows} rows in {len(windows)} windows "
+          f"of at most ~{budget_bytes(memory_budget_mb) // READ_ROW_BYTES} rows")
+    return rows, last_date
+
+
+class RowRange(lgb.Sequence):
+    """Rows [start, stop) of a float .npy matrix as float64, for lgb.Dataset."""
+
+    def __init__(self, path, start, stop, batch_size):
+        self.path = path
+        self.start = start
+        self.stop = stop
+        self.batch_size = batch_size
+        self._layout = npy_layout(path)
+        self._file = None
+        # Read-ahead block for single-row access: LightGBM samples rows in ascending order
+        self._block = (0, np.empty((0, self._layout[1][1])))
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def _read(self, a, b):
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        return read_rows(self.path, self.start + a, self.start + b, self._layout,
+                         self._file).astype(np.float64)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            a, b, step = idx.indices(len(self))
+            rows = self._read(a, b)
+            return rows if step == 1 else rows[::step]
+        if idx < 0:
+            idx += len(self)
+        first, block = self._block
+        if not first <= idx < first + len(block):
+            self._block = first, block = idx, self._read(idx, min(len(self), idx + self.batch_size))
+        return block[idx - first]
+
+    def close(self):
+        self._block = (0, self._block[1][:0])
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,164 @@
+# scripts/pipeline.py
+"""
+Declarative stage graph for main.py.
+
+Each Stage names the artifacts it reads and writes; an artifact is anything
+with a fingerprint function (a file hash, the feature data version, ...)
+that returns None while it does not exist. Dependencies follow from which
+stage produces each input. Before running, a stage's key is computed from
+its name, params and current input fingerprints; if the key matches the one
+stored after its last successful run and all its outputs exist, the stage is
+skipped. Independent stages run concurrently on a thread pool, so they share
+the already-imported modules and warm connections of this process.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from scripts import telemetry
+from scripts.telemetry import peak_rss_mb, format_rss  # noqa: F401 (re-exported)
+
+STATE_PATH = os.path.join('data', 'pipeline_state.json')
+
+
+class Stage:
+    def __init__(self, name, run, inputs=(), outputs=(), params=None, lock=None):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        # Stages sharing a lock name never overlap (e.g. matplotlib's global pyplot state)
+        self.lock = lock
+
+
+def dependencies(stages):
+    producers = {out: s.name for s in stages for out in s.outputs}
+    return {s.name: {producers[i] for i in s.inputs if i in producers and producers[i] != s.name}
+            for s in stages}
+
+
+def select(stages, only=None, start=None):
+    """Names of the stages to run: `only` as given, or `start` and everything downstream of it."""
+    names = [s.name for s in stages]
+    for name in (only or []) + ([start] if start else []):
+        if name not in names:
+            raise ValueError(f"Unknown stage {name!r}; choose from {', '.join(names)}")
+    if only:
+        return set(only)
+    if not start:
+        return set(names)
+    deps = dependencies(stages)
+    chosen = {start}
+    for name in names:  # stages are declared in topological order
+        if deps[name] & chosen:
+            chosen.add(name)
+    return chosen
+
+
+def _log(msg):
+    # One write per line so concurrent stages don't interleave mid-line
+    sys.stdout.write(msg + '\n')
+    sys.stdout.flush()
+
+
+def _load_state(path):
+    if os.path.isfile(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def run_pipeline(stages, artifacts, only=None, start=None, force=False, workers=4,
+                 state_path=STATE_PATH, profile=None, profile_dir=telemetry.PROFILE_DIR):
+    """
+    Run the selected stages in dependency order, up to `workers` at a time.
+    Returns a list of (stage, status, seconds, (peak RSS before, after)) with
+    status ran/skipped/failed/blocked. Peak RSS is process-wide, so stages
+    running concurrently share the attribution. Every stage is recorded in
+    telemetry; with `profile` ('cprofile' or 'pyinstrument') each stage that
+    runs is also profiled into `profile_dir`.
+    """
+    by_name = {s.name: s for s in stages}
+    deps = dependencies(stages)
+    chosen = select(stages, only, start)
+    state = _load_state(state_path)
+    state_lock = threading.Lock()
+    locks = {s.lock: threading.Lock() for s in stages if s.lock}
+    results = {}
+
+    def key(stage):
+        payload = {'stage': stage.name, 'params': stage.params,
+                   'inputs': {i: artifacts[i]() for i in stage.inputs}}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def run(stage):
+        with telemetry.profiled(stage.name, profile, profile_dir):
+            stage.run()
+
+    def execute(stage):
+        with telemetry.stage(stage.name) as rec:
+            status = _execute(stage)
+            rec['status'] = status[0]
+        return status
+
+    def _execute(stage):
+        t0 = time.perf_counter()
+        rss = peak_rss_mb()
+        k = key(stage)
+        if not force and state.get(stage.name) == k and \
+                all(artifacts[o]() is not None for o in stage.outputs):
+            _log(f"==> {stage.name}: inputs unchanged, skipping")
+            return 'skipped', time.perf_counter() - t0, (rss, peak_rss_mb())
+        _log(f"==> {stage.name}...")
+        try:
+            if stage.lock:
+                with locks[stage.lock]:
+                    run(stage)
+            else:
+                run(stage)
+        except Exception:
+            traceback.print_exc()
+            _log(f"==> {stage.name} failed")
+            return 'failed', time.perf_counter() - t0, (rss, peak_rss_mb())
+        with state_lock:
+            state[stage.name] = k
+            os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+            tmp = state_path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp, state_path)
+        return 'ran', time.perf_counter() - t0, (rss, peak_rss_mb())
+
+    started = time.perf_counter()
+    pending = [s.name for s in stages if s.name in chosen]
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name in list(pending):
+                upstream = deps[name] & chosen
+                if any(results.get(d, ('',))[0] in ('failed', 'blocked') for d in upstream):
+                    results[name] = ('blocked', 0.0, (None, None))
+                    pending.remove(name)
+                elif all(d in results for d in upstream):
+                    running[pool.submit(execute, by_name[name])] = name
+                    pending.remove(name)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                results[running.pop(fut)] = fut.result()
+
+    wall = time.perf_counter() - started
+    summary = [(name, *results[name]) for name in by_name if name in results]
+    print("\nStage timings (peak RSS before -> after):")
+    for name, status, seconds, (before, after) in summary:
+        print(f"  {name:<18} {status:<8} {seconds:8.2f}s   {format_rss(before, after)}")
+    print(f"  {'total':<18} {'':<8} {wall:8.2f}s wall "
+          f"({sum(r[2] for r in summary):.2f}s summed over stages)")
+    return summary
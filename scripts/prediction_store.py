@@ -0,0 +1,134 @@
+# scripts/prediction_store.py
+"""
+Persistent cache of model predictions shared by evaluate, backtest,
+threshold_scan and signal generation.
+
+Predictions are keyed by (model registry version, symbol, date): one .npz
+file per model version under PRED_DIR. Each cached row also keeps a
+fingerprint of the feature values it was scored on, and is only served
+while the row's features still match it. Feature rows are append-only
+across incremental builds, so a new data version scores just its new dates,
+while a rebuild that changes old rows rescores exactly those. Only rows
+missing or changed for that model are predicted (and the model is only
+loaded when there is such a row). When the directory grows past MAX_BYTES
+the least recently used files, i.e. old model versions, are evicted.
+Hit/miss counts are kept per process in STATS and cumulatively per model
+version in stats.json.
+"""
+import os
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+from scripts import model_registry, telemetry
+
+PRED_DIR = os.path.join('data', 'predictions')
+MAX_BYTES = 256 * 1024 ** 2
+STATS = {'hits': 0, 'misses': 0}
+# Odd 64-bit multipliers mixing a row's feature bits into its fingerprint
+_MIX = np.random.default_rng(0x5EED).integers(1, 2 ** 63, size=256, dtype=np.uint64) | np.uint64(1)
+
+# Pipeline stages predict concurrently; the first scores and caches, the rest hit the cache
+_lock = threading.RLock()
+
+
+def _load(path):
+    if not os.path.isfile(path):
+        return None
+    with np.load(path, allow_pickle=False) as z:
+        index = pd.MultiIndex.from_arrays([z['symbol'].astype(object), z['date']])
+        cached = pd.DataFrame({'pred': z['pred'], 'fp': z['fp']}, index=index)
+    os.utime(path)  # recency for LRU eviction
+    return cached
+
+
+def _save(path, cached):
+    tmp = path + '.tmp.npz'
+    np.savez(tmp,
+             symbol=cached.index.get_level_values(0).to_numpy().astype(str),
+             date=cached.index.get_level_values(1).to_numpy().astype(np.int64),
+             pred=cached['pred'].to_numpy(), fp=cached['fp'].to_numpy())
+    os.replace(tmp, path)
+
+
+def fingerprint(X):
+    """64-bit fingerprint of each row of X (as float64 bits); equal rows hash equal."""
+    bits = np.ascontiguousarray(X, dtype=np.float64).view(np.uint64)
+    # uint64 arithmetic wraps around, which is what the hash wants
+    return (bits * np.resize(_MIX, bits.shape[1])).sum(axis=1, dtype=np.uint64)
+
+
+def evict(root=PRED_DIR, max_bytes=MAX_BYTES, keep=None):
+    """Delete least recently used prediction files until the store fits in max_bytes."""
+    files = [os.path.join(root, f) for f in os.listdir(root) if f.endswith('.npz')]
+    files.sort(key=os.path.getmtime)
+    total = sum(os.path.getsize(f) for f in files)
+    for f in files:
+        if total <= max_bytes:
+            break
+        if f == keep:
+            continue
+        total -= os.path.getsize(f)
+        os.remove(f)
+        print(f"Evicted cached predictions {os.path.basename(f)}")
+
+
+def _record(root, key, hits, misses):
+    STATS['hits'] += hits
+    STATS['misses'] += misses
+    path = os.path.join(root, 'stats.json')
+    stats = {}
+    if os.path.isfile(path):
+        with open(path) as f:
+            stats = json.load(f)
+    entry = stats.setdefault(key, {'hits': 0, 'misses': 0})
+    entry['hits'] += hits
+    entry['misses'] += misses
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(stats, f, indent=2)
+    os.replace(tmp, path)
+
+
+def predict(df, feature_cols, model_version=None, root=PRED_DIR):
+    """
+    Predictions of registry model `model_version` (default: the current one)
+    for the rows of `df` (which must hold symbol, date and `feature_cols`),
+    served from the cache where the row's features are unchanged.
+    """
+    with _lock:
+        os.makedirs(root, exist_ok=True)
+        model_version = model_registry.resolve(model_version)
+        path = os.path.join(root, model_version + '.npz')
+
+        index = pd.MultiIndex.from_arrays([df['symbol'].to_numpy(dtype=object),
+                                           df['date'].to_numpy(dtype='datetime64[ns]').view(np.int64)])
+        X = df[feature_cols].to_numpy(dtype=np.float64)
+        fp = fingerprint(X)
+        cached = _load(path)
+        preds = np.full(len(df), np.nan)
+        miss = np.ones(len(df), dtype=bool)
+        if cached is not None:
+            pos = cached.index.get_indexer(index)
+            found = pos >= 0
+            miss[found] = cached['fp'].to_numpy()[pos[found]] != fp[found]
+            hit = ~miss
+            preds[hit] = cached['pred'].to_numpy()[pos[hit]]
+
+        if miss.any():
+            model = model_registry.load(model_version)
+            with telemetry.span('model_predict', 'predict', rows=int(miss.sum()),
+                                model_version=model_version):
+                preds[miss] = model.predict(X[miss])
+            new = pd.DataFrame({'pred': preds[miss], 'fp': fp[miss]}, index=index[miss])
+            if cached is not None:
+                # Rescored rows replace their stale entries
+                new = pd.concat([cached[~cached.index.isin(new.index)], new])
+            _save(path, new)
+            evict(root, keep=path)
+
+        hits, misses = int((~miss).sum()), int(miss.sum())
+        _record(root, model_version, hits, misses)
+        print(f"Predictions {model_version}: {hits} cached, {misses} newly scored")
+        return preds
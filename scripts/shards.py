@@ -0,0 +1,66 @@
+# scripts/shards.py
+"""
+Run per-symbol work over a process pool.
+
+The symbol universe is split into shards by striding over the sorted list
+(so every shard gets a similar mix of short and long histories), each shard
+runs in its own spawned process (a fork from the pipeline's thread pool
+could inherit a lock another thread holds) with its own database
+connection, and results come
+back in shard order whatever order the shards finish in. Each shard's wall
+and CPU time is recorded in the parent's telemetry as a 'shard' span, and
+the hot spots timed inside it are merged into the parent's current stage.
+"""
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from scripts.db import dispose_engines
+from scripts import telemetry
+from scripts.telemetry import peak_rss_mb
+
+
+def shard(items, n):
+    """Split sorted `items` into at most `n` non-empty, deterministic shards."""
+    items = sorted(items)
+    return [items[i::n] for i in range(min(n, len(items)))]
+
+
+def _run_shard(fn, items, kwargs):
+    telemetry.drain()  # drop spans inherited from the parent or an earlier shard
+    start, cpu = time.perf_counter(), time.process_time()
+    result = fn(items, **kwargs)
+    return (result, time.perf_counter() - start, time.process_time() - cpu, peak_rss_mb(),
+            telemetry.drain())
+
+
+def run_sharded(fn, items, workers=1, label='shard', **kwargs):
+    """
+    Call `fn(shard_items, **kwargs)` for every shard of `items` and return
+    the results as a list in shard order. `fn` must be a module-level
+    function and it and `kwargs` must pickle. With workers=1 the work runs in
+    this process, unsharded.
+    """
+    if workers <= 1 or len(items) <= 1:
+        return [fn(sorted(items), **kwargs)] if items else []
+
+    shards = shard(items, workers)
+    # Children must not reuse pooled connections inherited from this process
+    dispose_engines()
+    results = [None] * len(shards)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(shards),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(_run_shard, fn, part, kwargs): i for i, part in enumerate(shards)}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i], seconds, cpu, rss, hotspots = future.result()
+            telemetry.merge(hotspots)
+            telemetry.record(f"shard:{label}", 'shard', seconds, cpu, shard=i,
+                             symbols=len(shards[i]), peak_rss_mb=rss)
+            mem = f", peak RSS {rss:,.0f} MB" if rss is not None else ""
+            print(f"[{label}] shard {i + 1}/{len(shards)}: "
+                  f"{len(shards[i])} symbols in {seconds:.2f}s{mem}")
+    print(f"[{label}] {len(items)} symbols over {len(shards)} processes in "
+          f"{time.perf_counter() - start:.2f}s")
+    return results
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Long-running local signal service.
+
+Keeps the model and every symbol's latest feature row in memory (with their
+predictions precomputed) and answers batched scoring requests over HTTP:
+
+  POST /score   {"symbols": ["AAPL", ...], "threshold": 0.0}
+                  -> latest-bar prediction and BUY/SELL per symbol
+                {"rows": [{"symbol": "AAPL", "O": ..., "rsi_14": ..., ...}], "threshold": 0.0}
+                  -> scores caller-supplied (e.g. intraday) feature rows
+  GET  /stats   request count and p50/p99 service latency, model version, data version
+  POST /reload  force a reload (503 with the error if it fails; the previous
+                snapshot keeps serving)
+
+A background thread hot-reloads the model when a new registry version is
+promoted (or rolled back to) and the latest rows when the feature store
+moves to a new data version. --model-version pins one version instead.
+"""
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+from scripts.db import get_engine
+from scripts.feature_store import read_features, load_manifest, latest_start
+from scripts import model_registry
+
+
+class SignalState:
+    """Model plus latest-bar snapshot, swapped atomically on reload."""
+
+    def __init__(self, model_version=None):
+        self.model_version = model_version
+        self.snapshot = None
+        self.model_sig = None
+        self.data_sig = None
+        self.latencies = deque(maxlen=100_000)
+        self.requests = 0
+        self.lock = threading.Lock()
+        # Held from the version check to the swap: /reload and the watcher both reload
+        self.reload_lock = threading.Lock()
+        self.reload(force=True)
+
+    def _latest_rows(self, feature_cols):
+        engine = get_engine()
+        df = read_features(feature_cols, start=latest_start(engine), engine=engine)
+        return df.groupby('symbol').tail(1)
+
+    def reload(self, force=False):
+        with self.reload_lock:
+            return self._reload(force)
+
+    def _reload(self, force):
+        model_sig = model_registry.resolve(self.model_version)
+        manifest = load_manifest()
+        data_sig = manifest['version'] if manifest else None
+        if not force and model_sig == self.model_sig and data_sig == self.data_sig:
+            return False
+
+        t0 = time.perf_counter()
+        model = model_registry.load(model_sig)
+        # The columns this version was trained on, in its order
+        feature_cols = model_registry.manifest(model_sig)['feature_cols']
+        latest = self._latest_rows(feature_cols)
+        X = latest[feature_cols].to_numpy(dtype=np.float64)
+        preds = model.predict(X) if len(X) else np.empty(0)
+        self.snapshot = {
+            'model': model,
+            'model_version': model_sig,
+            'feature_cols': feature_cols,
+            'data_version': data_sig,
+            'index': {s: i for i, s in enumerate(latest['symbol'])},
+            'dates': latest['date'].dt.strftime('%Y-%m-%d').tolist(),
+            'preds': preds,
+        }
+        self.model_sig, self.data_sig = model_sig, data_sig
+        print(f"Loaded model {self.snapshot['model_version']} and {len(latest)} latest rows "
+              f"(data {data_sig}) in {time.perf_counter() - t0:.2f}s", flush=True)
+        return True
+
+    def watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload()
+            except Exception as exc:  # keep serving the previous snapshot
+                print(f"Reload failed: {exc}", flush=True)
+
+    def score(self, request):
+        if not isinstance(request, dict):
+            raise ValueError("request body must be a JSON object")
+        snap = self.snapshot
+        threshold = float(request.get('threshold', 0.0))
+        if 'rows' in request:
+            rows = request['rows']
+            X = np.array([[float(r[c]) for c in snap['feature_cols']] for r in rows], dtype=np.float64)
+            preds = snap['model'].predict(X) if len(X) else []
+            out = [{'symbol': r.get('symbol'), 'prediction': float(p)} for r, p in zip(rows, preds)]
+        else:
+            symbols = request.get('symbols') or list(snap['index'])
+            out = []
+            for s in symbols:
+                i = snap['index'].get(s)
+                if i is None:
+                    out.append({'symbol': s, 'error': 'unknown symbol'})
+                else:
+                    out.append({'symbol': s, 'date': snap['dates'][i],
+                                'prediction': float(snap['preds'][i])})
+        for o in out:
+            if 'prediction' in o:
+                o['signal'] = 'BUY' if o['prediction'] > threshold else 'SELL'
+        return {'model': snap['model_version'], 'data_version': snap['data_version'], 'signals': out}
+
+    def record(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+
+    def stats(self):
+        with self.lock:
+            lat = np.array(self.latencies)
+            n = self.requests
+        snap = self.snapshot
+        pct = (lambda q: float(np.percentile(lat, q) * 1000)) if len(lat) else (lambda q: None)
+        return {'requests': n, 'p50_ms': pct(50), 'p99_ms': pct(99),
+                'model': snap['model_version'], 'data_version': snap['data_version'],
+                'symbols': len(snap['index'])}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are separate writes; without this keep-alive clients stall on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, state.stats())
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            t0 = time.perf_counter()
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if self.path == '/score':
+                    payload = state.score(request)
+                elif self.path == '/reload':
+                    try:
+                        payload = {'reloaded': state.reload(force=True)}
+                    except Exception as exc:  # e.g. no promoted model, database down
+                        self._send(503, {'error': f"reload failed, serving the previous snapshot: "
+                                                  f"{type(exc).__name__}: {exc}"})
+                        return
+                else:
+                    self._send(404, {'error': 'not found'})
+                    return
+            except (ValueError, KeyError, TypeError) as exc:
+                self._send(400, {'error': str(exc)})
+                return
+            except Exception as exc:
+                self._send(500, {'error': f"{type(exc).__name__}: {exc}"})
+                return
+            self._send(200, payload)
+            if self.path == '/score':
+                state.record(time.perf_counter() - t0)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve BUY/SELL signals from a warm model.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--model-version', default=None,
+                        help="Serve this registry version instead of following the current one.")
+    parser.add_argument('--poll', type=float, default=2.0,
+                        help="Seconds between checks for a new model or data version.")
+    args = parser.parse_args()
+
+    state = SignalState(args.model_version)
+    threading.Thread(target=state.watch, args=(args.poll,), daemon=True).start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Signal server listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(state.stats()))
+
+
+if __name__ == '__main__':
+    main()
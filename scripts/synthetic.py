@@ -0,0 +1,94 @@
+# scripts/synthetic.py
+"""
+Synthetic OHLCV universes for the benchmarks.
+
+Each symbol is a geometric random walk with 2% daily volatility (scaled to
+the bar size for intraday bars), an open near the previous close, random
+wicks and uniform volume. Symbol i draws from its own seeded generator, so
+its bars don't depend on how many other symbols are generated and a
+universe can be written one symbol at a time.
+
+  bar_index()         bar timestamps for N trading days at a bar frequency
+  ohlcv_panel()       the universe as one long frame (symbol, date, O..V)
+  write_ohlcv_csvs()  one raw CSV per symbol in the fetch_data schema
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts.bar_store import SESSION
+
+END = '2025-06-30'
+DAILY_VOL = 0.02
+
+
+def bar_index(days, freq='1D', end=END, session=SESSION):
+    """
+    Bar timestamps covering `days` trading days ending at `end`, at `freq`:
+    1D, or an intraday bar size within `session`, with bars stamped with
+    their end, as Alpha Vantage (and the bar store) does.
+    """
+    dates = pd.bdate_range(end=end, periods=days)
+    if freq.upper() == '1D':
+        return dates
+    open_, close = (pd.Timedelta(t + ':00') for t in session)
+    step = pd.Timedelta(freq).value
+    ends = np.arange(open_.value + step, close.value + 1, step).astype('timedelta64[ns]')
+    return pd.DatetimeIndex((dates.values[:, None] + ends[None, :]).ravel())
+
+
+def symbol_bars(i, n, bars_per_day=1, seed=0):
+    """O, H, L, C, V arrays (oldest bar first) of symbol number `i` over `n` bars."""
+    rng = np.random.default_rng([seed, i])
+    vol = DAILY_VOL / np.sqrt(bars_per_day)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, vol, n)))
+    open_ = np.concatenate(([close[0]], close[:-1])) * (1 + rng.normal(0, vol / 4, n))
+    wick = np.abs(rng.normal(0, vol / 2, (2, n)))
+    return {'O': open_,
+            'H': np.maximum(open_, close) * (1 + wick[0]),
+            'L': np.minimum(open_, close) * (1 - wick[1]),
+            'C': close,
+            'V': rng.integers(10_000, 5_000_000, n)}
+
+
+def _bars_per_day(index):
+    return len(index) / max(1, len(pd.DatetimeIndex(index).normalize().unique()))
+
+
+def symbol_name(i):
+    return f"S{i:05d}"
+
+
+def ohlcv_panel(n_symbols, index, seed=0, columns=('O', 'H', 'L', 'C', 'V')):
+    """Long frame of `columns` for n_symbols over the bars of `index`, sorted by (symbol, date)."""
+    n = len(index)
+    per_day = _bars_per_day(index)
+    values = {c: np.empty((n_symbols, n), dtype=np.int64 if c == 'V' else np.float64)
+              for c in columns}
+    for i in range(n_symbols):
+        bars = symbol_bars(i, n, per_day, seed)
+        for c in columns:
+            values[c][i] = bars[c]
+    return pd.DataFrame({'symbol': np.repeat([symbol_name(i) for i in range(n_symbols)], n),
+                         'date': np.tile(pd.DatetimeIndex(index).values, n_symbols),
+                         **{c: v.ravel() for c, v in values.items()}})
+
+
+def write_ohlcv_csvs(folder, n_symbols, index, seed=0):
+    """
+    Write one OHLCV file per symbol (S00000.csv, ...) over the bars of
+    `index` in the fetch_data schema (date, O, H, L, C, V, newest bar
+    first). Returns the number of bars per symbol.
+    """
+    index = pd.DatetimeIndex(index)
+    daily = bool((index.normalize() == index).all())
+    dates = index.strftime('%Y-%m-%d' if daily else '%Y-%m-%d %H:%M:%S')[::-1]
+    n, per_day = len(index), _bars_per_day(index)
+    os.makedirs(folder, exist_ok=True)
+    for i in range(n_symbols):
+        bars = symbol_bars(i, n, per_day, seed)
+        frame = pd.DataFrame({'date': dates, **{c: v[::-1] for c, v in bars.items()}})
+        frame.to_csv(os.path.join(folder, f"{symbol_name(i)}.csv"), index=False,
+                     float_format='%.4f')
+    return n
@@ -0,0 +1,303 @@
+# scripts/telemetry.py
+"""
+Run instrumentation: wall time, CPU time, peak RSS and row counts for every
+pipeline stage and for the hot spots inside them.
+
+  with telemetry.stage('etl') as rec:          # one per stage (pipeline.py does this)
+      ...
+      with telemetry.span('csv_read', 'read') as s:
+          df = pd.read_csv(path)
+          s.rows = len(df)
+
+A span is attributed to the stage running on its thread. Its kind decides
+how its rows count towards that stage: 'read' spans add to rows_in and
+'write' spans to rows_out; 'train', 'predict' and other kinds only report
+their own rows/sec. Work done in worker processes is reported from the
+parent with record(), or collected there with drain() and merged into the
+parent's current stage with merge(). CPU time and peak RSS are process-wide, so stages
+running concurrently share them.
+
+write_report() saves the run under reports/runs/ as <run id>.json (and
+latest.json) and refreshes that command's Prometheus textfile next to them
+(alphaquant_<command>.prom, one per command so separately scheduled runs
+don't erase each other's metrics), for node_exporter's textfile collector. profiled() wraps a stage in cProfile
+(or pyinstrument, if installed) and dumps the result to reports/profiles/.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_DIR = os.path.join('reports', 'runs')
+# One textfile per command; node_exporter reads every *.prom in the directory
+PROM_PATH = os.path.join(REPORT_DIR, 'alphaquant_{command}.prom')
+PROFILE_DIR = os.path.join('reports', 'profiles')
+PROFILERS = ['cprofile', 'pyinstrument']
+# Individual spans kept for the JSON report; aggregates always cover every span
+MAX_SPANS = 20_000
+
+_lock = threading.Lock()
+_local = threading.local()
+_stages = []
+_spans = []
+_hotspots = {}
+_started = (time.time(), time.perf_counter())
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def format_rss(before, after):
+    if before is None:
+        return 'n/a'
+    return f"{before:,.0f} -> {after:,.0f} MB"
+
+
+def cpu_seconds():
+    """CPU time of this process plus its finished child processes."""
+    if resource is None:
+        return time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class Span:
+    __slots__ = ('name', 'kind', 'rows', 'labels')
+
+    def __init__(self, name, kind, rows, labels):
+        self.name = name
+        self.kind = kind
+        self.rows = rows
+        self.labels = labels
+
+
+def record(name, kind, wall, cpu=None, rows=None, stage=None, **labels):
+    """Add a span that was timed elsewhere (e.g. in a worker process)."""
+    stage = stage or getattr(_local, 'stage', None)
+    entry = {'stage': stage, 'name': name, 'kind': kind, 'wall': round(wall, 6),
+             'cpu': None if cpu is None else round(cpu, 6), 'rows': rows, **labels}
+    with _lock:
+        if len(_spans) < MAX_SPANS:
+            _spans.append(entry)
+        agg = _hotspots.setdefault((stage, kind, name), {'calls': 0, 'wall': 0.0, 'wall_max': 0.0,
+                                                         'cpu': 0.0, 'rows': 0})
+        agg['calls'] += 1
+        agg['wall'] += wall
+        agg['wall_max'] = max(agg['wall_max'], wall)
+        agg['cpu'] += cpu or 0.0
+        agg['rows'] += rows or 0
+
+
+def drain():
+    """Remove and return this process's hot-spot aggregates (to send to a parent process)."""
+    with _lock:
+        out = {k: dict(v) for k, v in _hotspots.items()}
+        _hotspots.clear()
+        _spans.clear()
+    return out
+
+
+def merge(hotspots):
+    """Add aggregates from drain() in another process to the current stage."""
+    stage = getattr(_local, 'stage', None)
+    with _lock:
+        for (_, kind, name), v in hotspots.items():
+            agg = _hotspots.setdefault((stage, kind, name), {'calls': 0, 'wall': 0.0, 'wall_max': 0.0,
+                                                             'cpu': 0.0, 'rows': 0})
+            for k in ('calls', 'wall', 'cpu', 'rows'):
+                agg[k] += v[k]
+            agg['wall_max'] = max(agg['wall_max'], v['wall_max'])
+
+
+@contextmanager
+def span(name, kind='op', rows=None, **labels):
+    """Time a hot spot; set `.rows` on the yielded span once the row count is known."""
+    s = Span(name, kind, rows, labels)
+    t0, c0 = time.perf_counter(), cpu_seconds()
+    try:
+        yield s
+    finally:
+        record(s.name, s.kind, time.perf_counter() - t0, cpu_seconds() - c0, s.rows, **s.labels)
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage; set rec['status'] to override 'ran' (e.g. 'skipped')."""
+    prev, _local.stage = getattr(_local, 'stage', None), name
+    rec = {'stage': name, 'status': 'ran', 'rss_before_mb': peak_rss_mb()}
+    t0, c0 = time.perf_counter(), cpu_seconds()
+    try:
+        yield rec
+    except BaseException:
+        rec['status'] = 'failed'
+        raise
+    finally:
+        _local.stage = prev
+        rec['wall'] = round(time.perf_counter() - t0, 6)
+        rec['cpu'] = round(cpu_seconds() - c0, 6)
+        rec['rss_after_mb'] = peak_rss_mb()
+        with _lock:
+            mine = [(k, v) for k, v in _hotspots.items() if k[0] == name]
+            rec['rows_in'] = sum(v['rows'] for k, v in mine if k[1] == 'read')
+            rec['rows_out'] = sum(v['rows'] for k, v in mine if k[1] == 'write')
+            rows = rec['rows_in'] + rec['rows_out']
+            rec['rows_per_sec'] = round(rows / rec['wall'], 1) if rows and rec['wall'] > 0 else None
+            _stages.append(rec)
+
+
+@contextmanager
+def profiled(name, profiler=None, out_dir=PROFILE_DIR):
+    """Profile the enclosed block (on this thread) and dump it as <out_dir>/<name>.*"""
+    if profiler is None:
+        yield
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, name)
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("--profile pyinstrument needs `pip install pyinstrument`") from None
+        prof = Profiler()
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            with open(base + '.html', 'w') as f:
+                f.write(prof.output_html())
+            with open(base + '.txt', 'w') as f:
+                f.write(prof.output_text(unicode=False, color=False))
+        return
+    import cProfile
+    import pstats
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(base + '.prof')
+        with open(base + '.txt', 'w') as f:
+            pstats.Stats(prof, stream=f).sort_stats('cumulative').print_stats(40)
+
+
+def _hotspot_rows():
+    out = []
+    for (stage_name, kind, name), v in sorted(_hotspots.items(), key=lambda kv: -kv[1]['wall']):
+        out.append({'stage': stage_name, 'kind': kind, 'name': name, 'calls': v['calls'],
+                    'wall': round(v['wall'], 6), 'wall_max': round(v['wall_max'], 6),
+                    'cpu': round(v['cpu'], 6), 'rows': v['rows'],
+                    'rows_per_sec': round(v['rows'] / v['wall'], 1) if v['rows'] and v['wall'] > 0
+                    else None})
+    return out
+
+
+def _prom_labels(**labels):
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{k}="{v}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def prometheus_text(report):
+    """The run as Prometheus exposition text (gauges describing the last run)."""
+    metrics = {
+        'alphaquant_run_duration_seconds': ("Wall time of the last run.", []),
+        'alphaquant_run_timestamp_seconds': ("Unix time the last run finished.", []),
+        'alphaquant_stage_duration_seconds': ("Wall time of each stage in the last run.", []),
+        'alphaquant_stage_cpu_seconds': ("Process CPU time during each stage.", []),
+        'alphaquant_stage_peak_rss_bytes': ("Process peak RSS after each stage.", []),
+        'alphaquant_stage_rows': ("Rows read (in) and written (out) by each stage.", []),
+        'alphaquant_hotspot_calls': ("Calls of each instrumented hot spot.", []),
+        'alphaquant_hotspot_duration_seconds': ("Total wall time in each hot spot.", []),
+        'alphaquant_hotspot_rows': ("Rows processed by each hot spot.", []),
+    }
+    cmd = report['command']
+    metrics['alphaquant_run_duration_seconds'][1].append((_prom_labels(command=cmd), report['wall']))
+    metrics['alphaquant_run_timestamp_seconds'][1].append((_prom_labels(command=cmd),
+                                                           report['finished_unix']))
+    for s in report['stages']:
+        lab = dict(command=cmd, stage=s['stage'])
+        metrics['alphaquant_stage_duration_seconds'][1].append(
+            (_prom_labels(**lab, status=s['status']), s['wall']))
+        metrics['alphaquant_stage_cpu_seconds'][1].append((_prom_labels(**lab), s['cpu']))
+        if s['rss_after_mb'] is not None:
+            metrics['alphaquant_stage_peak_rss_bytes'][1].append(
+                (_prom_labels(**lab), int(s['rss_after_mb'] * 1024 ** 2)))
+        for direction in ('in', 'out'):
+            metrics['alphaquant_stage_rows'][1].append(
+                (_prom_labels(**lab, direction=direction), s[f'rows_{direction}']))
+    for h in report['hotspots']:
+        lab = _prom_labels(command=cmd, stage=h['stage'] or '', kind=h['kind'], name=h['name'])
+        metrics['alphaquant_hotspot_calls'][1].append((lab, h['calls']))
+        metrics['alphaquant_hotspot_duration_seconds'][1].append((lab, h['wall']))
+        metrics['alphaquant_hotspot_rows'][1].append((lab, h['rows']))
+    lines = []
+    for metric, (help_text, samples) in metrics.items():
+        if not samples:
+            continue
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        lines += [f"{metric}{labels} {value}" for labels, value in samples]
+    return '\n'.join(lines) + '\n'
+
+
+def _write(path, text):
+    # Rename into place: the textfile collector must never read a partial file
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_report(command, argv=None, run_id=None, out_dir=REPORT_DIR, prom_path=PROM_PATH):
+    """
+    Write this process's stages and hot spots as a JSON run report plus a
+    Prometheus textfile (`prom_path`, formatted with the command name).
+    """
+    now = time.time()
+    run_id = run_id or f"{datetime.fromtimestamp(_started[0], timezone.utc):%Y%m%dT%H%M%S}-{command}"
+    with _lock:
+        report = {
+            'run_id': run_id,
+            'command': command,
+            'argv': list(sys.argv if argv is None else argv),
+            'started_at': datetime.fromtimestamp(_started[0], timezone.utc).isoformat(timespec='seconds'),
+            'finished_unix': round(now, 3),
+            'wall': round(time.perf_counter() - _started[1], 3),
+            'cpu': round(cpu_seconds(), 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': list(_stages),
+            'hotspots': _hotspot_rows(),
+            'spans': list(_spans),
+            'spans_dropped': max(0, sum(v['calls'] for v in _hotspots.values()) - len(_spans)),
+        }
+    os.makedirs(out_dir, exist_ok=True)
+    text = json.dumps(report, indent=2, default=str)
+    path = os.path.join(out_dir, report['run_id'] + '.json')
+    _write(path, text)
+    _write(os.path.join(out_dir, 'latest.json'), text)
+    if prom_path:
+        prom_path = prom_path.format(command=command)
+        os.makedirs(os.path.dirname(prom_path) or '.', exist_ok=True)
+        _write(prom_path, prometheus_text(report))
+        # The single shared textfile of earlier versions would duplicate these series
+        legacy = os.path.join(os.path.dirname(prom_path), 'alphaquant.prom')
+        if os.path.exists(legacy):
+            os.remove(legacy)
+    print(f"Run report written to {path}")
+    return path
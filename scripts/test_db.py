@@ -1,9 +1,8 @@
 # scripts/test_db.py
-import sqlalchemy
 from sqlalchemy import text
-from config import DATABASE_URL
+from scripts.db import get_engine
 
-engine = sqlalchemy.create_engine(DATABASE_URL)
+engine = get_engine()
 with engine.connect() as conn:
     count = conn.execute(text("SELECT COUNT(*) FROM daily_ohlcv;")).scalar()
     print("Total rows in daily_ohlcv:", count)
\ No newline at end of file
@@ -1,15 +1,40 @@
 #scripts/threshold_scan.py
-import pandas as pd
-from scripts.backtest import backtest
-
-thresholds = [0, 0.001, 0.002, 0.005, 0.01]
-rows = []
-for thr in thresholds:
-    daily = backtest(threshold=thr)
-    total = daily['nav'].iloc[-1]/daily['nav'].iloc[0] - 1
-    ret = daily['strat_ret']
-    sharpe = (ret.mean()/ret.std())*(252**0.5)
-    mdd = ((daily['nav'].cummax()-daily['nav'])/daily['nav'].cummax()).max()
-    rows.append({'threshold':thr, 'return':total, 'sharpe':sharpe, 'max_dd':mdd})
-df = pd.DataFrame(rows)
-df.to_csv('data/results/threshold_results.csv', index=False)
\ No newline at end of file
+import os
+import time
+import argparse
+import numpy as np
+from scripts.backtest import scan_thresholds
+
+
+def scan(thresholds, initial_capital=1_000_000, output='data/results/threshold_results.csv',
+         model_version=None):
+    t0 = time.perf_counter()
+    df = scan_thresholds(thresholds, initial_capital=initial_capital, model_version=model_version)
+    print(f"Scanned {len(thresholds)} thresholds in {time.perf_counter() - t0:.2f}s")
+
+    if df['sharpe'].notna().any():
+        best = df.loc[df['sharpe'].idxmax()]
+        print(f"Best Sharpe {best['sharpe']:.2f} at threshold {best['threshold']:.4f} "
+              f"(return {best['return'] * 100:.1f}%, max drawdown {best['max_dd'] * 100:.1f}%)")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    df.to_csv(output, index=False)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest a grid of signal thresholds in one pass.")
+    parser.add_argument('--start', type=float, default=0.0)
+    parser.add_argument('--stop', type=float, default=0.02)
+    parser.add_argument('--num', type=int, default=201,
+                        help="Number of evenly spaced thresholds in [start, stop].")
+    parser.add_argument('--capital', type=float, default=1_000_000)
+    parser.add_argument('--output', default='data/results/threshold_results.csv')
+    parser.add_argument('--model-version', help="Registry model version (default: current).")
+    args = parser.parse_args()
+
+    scan(np.linspace(args.start, args.stop, args.num), args.capital, args.output, args.model_version)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,196 @@
 import os
-import joblib
+import time
+import functools
+import multiprocessing
+from datetime import datetime, timezone
 import numpy as np
 import pandas as pd
 import optuna
-from sqlalchemy import create_engine
+import lightgbm as lgb
+from optuna.storages import JournalStorage
+from optuna.storages.journal import JournalFileBackend
+from optuna.trial import TrialState
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import mean_squared_error
 from lightgbm import LGBMRegressor, early_stopping, log_evaluation
-from config import DATABASE_URL
+from scripts.db import get_engine
+from scripts.feature_store import read_features, data_version
+from scripts import model_registry, out_of_core, telemetry
 
+FEATURE_COLS = ['O', 'H', 'L', 'C', 'V', 'rsi_14', 'sma_20']
+N_SPLITS = 5
+# Design matrix shared (memory-mapped) by every trial of a study
+CACHE_DIR = os.path.join('models', 'study_cache')
+# Bins are built once per fold, so trial params must not change dataset construction;
+# feature_pre_filter=False lets min_child_samples vary on an already-binned Dataset.
+DATASET_PARAMS = {'feature_pre_filter': False, 'verbose': -1}
+# File-backed study store: safe for concurrent worker processes and resumable after a crash
+STUDY_STORAGE = os.path.join('models', 'optuna_journal.log')
+PRUNERS = {
+    'none': lambda: optuna.pruners.NopPruner(),
+    'median': lambda: optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=0),
+    'hyperband': lambda: optuna.pruners.HyperbandPruner(min_resource=1, max_resource=N_SPLITS),
+    'successive_halving': lambda: optuna.pruners.SuccessiveHalvingPruner(),
+}
+TRAIN_MODES = ['auto', 'search', 'refresh']
+# auto mode: re-search when the last search is this old or the model's RMSE on new
+# rows exceeds its CV RMSE by more than DRIFT_THRESHOLD (relative)
+SEARCH_EVERY_DAYS = 7
+DRIFT_THRESHOLD = 0.10
+# Trees added per refresh on top of the saved booster
+REFRESH_ROUNDS = 25
+HISTORY_LENGTH = 50
+# Bytes per training row held in memory with a memory budget: the binned row
+# (one byte per feature) and float32 label, again in the fold's subset, plus
+# LightGBM's per-row gradients, scores and indices (~80 measured for 7 features)
+BINNED_ROW_BYTES = 8 * len(FEATURE_COLS) + 24
 
-def load_data():
-    # Load features table from database
-    engine = create_engine(DATABASE_URL)
-    df = pd.read_sql("SELECT * FROM daily_features ORDER BY date", engine, parse_dates=['date'])
-    # Create target: next-day return
-    df['target'] = df.groupby('symbol')['C'].pct_change().shift(-1)
-    df.dropna(inplace=True)
-    feature_cols = ['O', 'H', 'L', 'C', 'V', 'rsi_14', 'sma_20']
-    X = df[feature_cols].values
-    y = df['target'].values
-    return X, y
 
+def budget_rows(n, memory_budget, truncate=False):
+    """
+    Rows of an n-row design matrix that fit `memory_budget` (MB) once binned.
+    Raises if they don't all fit, unless `truncate` allows training on only
+    the most recent rows that do.
+    """
+    fit = out_of_core.budget_bytes(memory_budget) // BINNED_ROW_BYTES
+    if fit >= n:
+        return n
+    if not truncate:
+        need = n * BINNED_ROW_BYTES / 1024 ** 2
+        raise ValueError(f"A memory budget of {memory_budget:g} MB fits {fit} of {n} binned rows "
+                         f"(all of them need about {need:.1f} MB); raise it or pass "
+                         f"--truncate-to-budget to train on the most recent {fit} rows")
+    return fit
 
-def objective(trial):
-    # Load data inside the objective
-    X, y = load_data()
 
-    # Suggest hyperparameters
-    param = {
+def study_rows(memory_budget, jobs=1, truncate=False, cache_dir=CACHE_DIR):
+    """
+    Most recent rows that binned trials and the final fit all train on: what
+    one of `jobs` workers' share of `memory_budget` (MB) fits (see budget_rows),
+    so the final model is fit on the rows its CV score was measured on.
+    """
+    n = out_of_core.npy_layout(os.path.join(cache_dir, 'y.npy'))[1][0]
+    return budget_rows(n, memory_budget / jobs, truncate)
+
+
+def load_data(start=None):
+    # Load features from the feature store (falls back to the database when stale)
+    # Target: each symbol's next-day return, computed by the loader
+    df = read_features(FEATURE_COLS, start=start, returns=True)
+    keep = df[FEATURE_COLS + ['target']].notna().all(axis=1).to_numpy()
+    # float32 straight from the compact frame; LightGBM bins it without another copy
+    X = df.loc[keep, FEATURE_COLS].to_numpy(dtype=np.float32)
+    y = df.loc[keep, 'target'].to_numpy(dtype=np.float64)
+    return X, y, df.loc[keep, 'date'].to_numpy()
+
+
+def cache_design_matrix(cache_dir=CACHE_DIR, memory_budget=None):
+    """
+    Load X, y once and persist them so every trial (and worker) can memory-map
+    them. Returns the memory-mapped X, y and the last date they cover. With a
+    `memory_budget` (MB) they are streamed to disk in date windows instead of
+    being loaded whole.
+    """
+    if memory_budget is not None:
+        _, last_date = out_of_core.write_design_matrix(FEATURE_COLS, cache_dir, memory_budget)
+        return open_design_matrix(cache_dir) + (last_date,)
+    X, y, dates = load_data()
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(os.path.join(cache_dir, 'X.npy'), np.ascontiguousarray(X, dtype=np.float32))
+    np.save(os.path.join(cache_dir, 'y.npy'), np.ascontiguousarray(y, dtype=np.float64))
+    return open_design_matrix(cache_dir) + (pd.Timestamp(dates.max()),)
+
+
+def open_design_matrix(cache_dir=CACHE_DIR):
+    return (np.load(os.path.join(cache_dir, 'X.npy'), mmap_mode='r'),
+            np.load(os.path.join(cache_dir, 'y.npy'), mmap_mode='r'))
+
+
+def fold_ranges(n_rows, n_splits=N_SPLITS):
+    """TimeSeriesSplit folds as (train_stop, valid_stop): train is [0, train_stop)."""
+    return [(int(valid[0]), int(valid[-1]) + 1)
+            for _, valid in TimeSeriesSplit(n_splits=n_splits).split(np.empty(n_rows))]
+
+
+class StudyData:
+    """Read-only design matrix, fold ranges and per-fold binned Datasets shared by all trials."""
+
+    def __init__(self, X, y, n_splits=N_SPLITS):
+        self.X = X
+        self.y = y
+        self.folds = fold_ranges(len(y), n_splits)
+        self._datasets = {}
+
+    def fold(self, i):
+        if i not in self._datasets:
+            train_stop, valid_stop = self.folds[i]
+            train_set = lgb.Dataset(self.X[:train_stop], self.y[:train_stop],
+                                    params=DATASET_PARAMS, free_raw_data=False).construct()
+            valid_set = lgb.Dataset(self.X[train_stop:valid_stop], self.y[train_stop:valid_stop],
+                                    reference=train_set, params=DATASET_PARAMS,
+                                    free_raw_data=False).construct()
+            self._datasets[i] = (train_set, valid_set)
+        return self._datasets[i]
+
+    def predict(self, booster, start, stop, num_iteration=None):
+        return booster.predict(self.X[start:stop], num_iteration=num_iteration)
+
+
+class BinnedStudyData:
+    """
+    StudyData within a memory budget (MB). One LightGBM Dataset is binned from
+    the cached design matrix out of core: bins come from a sample of rows and
+    the rows are pushed in batches, so raw features never sit in memory. Folds
+    are row-range subsets of it that share its bins, built one at a time. If
+    the binned rows would not fit the budget it raises, unless `truncate`
+    allows using only the most recent rows that do (see budget_rows).
+    `rows` instead uses the most recent `rows` rows (see study_rows).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, memory_budget=None, n_splits=N_SPLITS, truncate=False,
+                 rows=None):
+        budget = out_of_core.budget_bytes(memory_budget)
+        self.X_path = os.path.join(cache_dir, 'X.npy')
+        self.y_path = os.path.join(cache_dir, 'y.npy')
+        n = out_of_core.npy_layout(self.y_path)[1][0]
+        self.first = n - (min(rows, n) if rows is not None else budget_rows(n, memory_budget, truncate))
+        if self.first:
+            print(f"Training on the most recent {n - self.first} of {n} rows that fit the "
+                  f"memory budget (--truncate-to-budget)")
+        # Raw float64 batches (pushed rows and predicted rows) take at most a quarter of the budget
+        self.batch_size = max(1, budget // (4 * 8 * len(FEATURE_COLS)))
+        self.y = np.empty(n - self.first, dtype=np.float32)
+        for a in range(self.first, n, self.batch_size):
+            b = min(n, a + self.batch_size)
+            self.y[a - self.first:b - self.first] = out_of_core.read_rows(self.y_path, a, b)
+        rows = out_of_core.RowRange(self.X_path, self.first, n, self.batch_size)
+        with telemetry.span('bin_dataset', 'train', rows=len(rows)):
+            params = dict(DATASET_PARAMS, bin_construct_sample_cnt=out_of_core.BIN_SAMPLE_ROWS)
+            self.full = lgb.Dataset(rows, self.y, params=params).construct()
+        rows.close()
+        self.folds = fold_ranges(len(self.y), n_splits)
+        self._fold = (None, None)
+
+    def fold(self, i):
+        if self._fold[0] != i:
+            self._fold = (None, None)  # release the previous fold first
+            train_stop, valid_stop = self.folds[i]
+            self._fold = (i, (self.full.subset(np.arange(train_stop)).construct(),
+                              self.full.subset(np.arange(train_stop, valid_stop)).construct()))
+        return self._fold[1]
+
+    def predict(self, booster, start, stop, num_iteration=None):
+        """Predictions for rows [start, stop), read and scored batch by batch."""
+        out = []
+        for a in range(start, stop, self.batch_size):
+            b = min(stop, a + self.batch_size)
+            X = out_of_core.read_rows(self.X_path, self.first + a, self.first + b)
+            out.append(booster.predict(X, num_iteration=num_iteration))
+        return np.concatenate(out) if out else np.empty(0)
+
+
+def suggest_params(trial):
+    return {
         'num_leaves': trial.suggest_int('num_leaves', 31, 255),
         'max_depth': trial.suggest_int('max_depth', 5, 20),
         'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.1, log=True),
@@ -41,44 +203,296 @@ def objective(trial):
         'random_state': 42
     }
 
-    # Time series cross-validation
-    tscv = TimeSeriesSplit(n_splits=5)
+
+def objective(trial, data, num_threads=0):
+    # Suggest hyperparameters
+    param = suggest_params(trial)
+    param['num_threads'] = num_threads
+    num_boost_round = param.pop('n_estimators')
+
+    # Time series cross-validation on the pre-binned fold Datasets
     rmses = []
-    for train_idx, valid_idx in tscv.split(X):
-        X_train, X_valid = X[train_idx], X[valid_idx]
-        y_train, y_valid = y[train_idx], y[valid_idx]
-        model = LGBMRegressor(**param)
-        model.fit(
-            X_train,
-            y_train,
-            eval_set=[(X_valid, y_valid)],
-            callbacks=[
-                early_stopping(stopping_rounds=50),
-                log_evaluation(period=100)
-            ],
-        )
-        preds = model.predict(X_valid)
-        rmse = np.sqrt(mean_squared_error(y_valid, preds))
+    for i, (train_stop, valid_stop) in enumerate(data.folds):
+        train_set, valid_set = data.fold(i)
+        with telemetry.span('cv_fold', 'train', rows=train_stop, trial=trial.number, fold=i):
+            booster = lgb.train(
+                param,
+                train_set,
+                num_boost_round=num_boost_round,
+                valid_sets=[valid_set],
+                callbacks=[
+                    early_stopping(stopping_rounds=50),
+                    log_evaluation(period=100)
+                ],
+            )
+        with telemetry.span('cv_predict', 'predict', rows=valid_stop - train_stop,
+                            trial=trial.number, fold=i):
+            preds = data.predict(booster, train_stop, valid_stop, num_iteration=booster.best_iteration)
+        rmse = np.sqrt(mean_squared_error(data.y[train_stop:valid_stop], preds))
         rmses.append(rmse)
 
+        # Let the pruner stop hopeless trials after any fold
+        trial.report(rmse, step=i)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
     # Return average RMSE
     return float(np.mean(rmses))
 
 
-def train_and_save(trials: int = 50, model_path: str = 'models/model.pkl'):
-    # Create study
-    study = optuna.create_study(direction='minimize')
-    study.optimize(objective, n_trials=trials)
+def _storage(storage_path):
+    os.makedirs(os.path.dirname(storage_path) or '.', exist_ok=True)
+    return JournalStorage(JournalFileBackend(storage_path))
+
+
+def _run_worker(study_name, storage_path, pruner, trials, num_threads, cache_dir, started, seed=None,
+                memory_budget=None, rows=None):
+    """Run trials of a shared study until `trials` have completed or been pruned."""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    if memory_budget is not None:
+        data = BinnedStudyData(cache_dir, memory_budget, rows=rows)
+    else:
+        data = StudyData(*open_design_matrix(cache_dir))
+    study = optuna.load_study(study_name=study_name, storage=_storage(storage_path),
+                              pruner=PRUNERS[pruner](), sampler=optuna.samplers.TPESampler(seed=seed))
+    done_states = (TrialState.COMPLETE, TrialState.PRUNED)
+
+    def log_rate(study, trial):
+        finished = study.get_trials(deepcopy=False, states=done_states)
+        # The rate counts only trials finished by this run, not those resumed from the journal
+        recent = sum(t.datetime_complete.timestamp() >= started for t in finished)
+        minutes = max(time.time() - started, 1e-9) / 60
+        print(f"Trial {trial.number} {trial.state.name.lower()} "
+              f"({len(finished)}/{trials} done, {recent / minutes:.1f} trials/min)")
+
+    if len(study.get_trials(deepcopy=False, states=done_states)) < trials:
+        study.optimize(functools.partial(objective, data=data, num_threads=num_threads),
+                       callbacks=[optuna.study.MaxTrialsCallback(trials, states=done_states),
+                                  log_rate])
+
+
+def run_study(trials=50, jobs=1, pruner='median', storage_path=STUDY_STORAGE,
+              study_name=None, cache_dir=CACHE_DIR, seed=None, memory_budget=None, truncate=False,
+              rows=None):
+    """
+    Hyperparameter search over `jobs` worker processes sharing one file-backed study.
+
+    The study is named after the feature data version, so re-running after a
+    crash resumes it and only the missing trials are run; new data starts a new
+    study. A `seed` makes the sampled params reproducible (worker i samples
+    with seed + i). With a `memory_budget` (MB, split evenly between the
+    workers) trials train on BinnedStudyData instead of the in-memory matrix;
+    a budget too small for every row raises unless `truncate` is set. They
+    train on the most recent `rows` rows, by default study_rows().
+    Returns the loaded study.
+    """
+    name = f"lgbm-{data_version(get_engine())}"
+    if memory_budget is not None:
+        # Checked here so an oversized matrix fails before any worker starts. Binned
+        # trials (and any truncation) form a study of their own, named by the rows used
+        n = out_of_core.npy_layout(os.path.join(cache_dir, 'y.npy'))[1][0]
+        if rows is None:
+            rows = study_rows(memory_budget, jobs, truncate, cache_dir)
+        name += f"-budget{memory_budget:g}mb" + (f"-last{rows}rows" if rows < n else "")
+    study_name = study_name or name
+    optuna.create_study(study_name=study_name, storage=_storage(storage_path),
+                        direction='minimize', load_if_exists=True)
+
+    started = time.time()
+    before = len(optuna.load_study(study_name=study_name, storage=_storage(storage_path))
+                 .get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)))
+    num_threads = max(1, (os.cpu_count() or 1) // jobs) if jobs > 1 else 0
+    args = (study_name, storage_path, pruner, trials, num_threads, cache_dir, started)
+    if jobs > 1:
+        ctx = multiprocessing.get_context('spawn')
+        budget = None if memory_budget is None else memory_budget / jobs
+        workers = [ctx.Process(target=_run_worker,
+                               args=args + (None if seed is None else seed + i, budget, rows))
+                   for i in range(jobs)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        failed = [w.exitcode for w in workers if w.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"{len(failed)} search worker(s) failed (exit codes {failed})")
+    else:
+        _run_worker(*args, seed, memory_budget, rows)
+
+    study = optuna.load_study(study_name=study_name, storage=_storage(storage_path))
+    finished = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED))
+    # Trials may have run in worker processes, so take their timings from the study
+    for t in finished:
+        if t.datetime_start.timestamp() >= started:
+            telemetry.record('optuna_trial', 'trial', t.duration.total_seconds(), trial=t.number,
+                             state=t.state.name.lower(), value=t.value)
+    pruned = sum(t.state == TrialState.PRUNED for t in finished)
+    if pruned == len(finished):
+        raise RuntimeError(f"Study {study_name} has no completed trial ({pruned} pruned, "
+                           f"{len(study.trials) - len(finished)} failed or running); run more "
+                           f"--trials or use a less aggressive --pruner")
+    minutes = max(time.time() - started, 1e-9) / 60
+    print(f"Study {study_name}: {len(finished) - before} trials this run "
+          f"({(len(finished) - before) / minutes:.1f} trials/min, {jobs} jobs), "
+          f"{pruned}/{len(finished)} pruned in total, best RMSE {study.best_value:.6f}")
+    return study
+
+
+def load_meta(root=model_registry.REGISTRY_DIR):
+    """Manifest of the current model if it can be refreshed (i.e. came from a search here)."""
+    if model_registry.current_version(root) is None:
+        return None
+    meta = model_registry.manifest(root=root)
+    return meta if 'best_params' in meta and 'trained_through' in meta else None
+
+
+def _save(booster, meta, root, promote):
+    version = model_registry.register(booster, meta, root)
+    if promote:
+        model_registry.promote(version, root)
+    return version
+
+
+def _lineage(mode, parent, rows_added, started, reason, prev=None):
+    lineage = {'mode': mode, 'parent': parent, 'rows_added': int(rows_added),
+               'seconds': round(time.time() - started, 3), 'reason': reason,
+               'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+    history = [] if prev is None else ([prev['lineage']] + prev.get('history', []))
+    return lineage, history[:HISTORY_LENGTH]
+
+
+def _search_reason(meta, model, X_new, y_new, search_every_days, drift):
+    """Why `auto` mode should re-run the search instead of refreshing, or None."""
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(meta['searched_at'])
+    if age.days >= search_every_days:
+        return f"last search was {age.days} days ago"
+    if len(y_new):
+        with telemetry.span('drift_predict', 'predict', rows=len(y_new)):
+            pred = model.predict(X_new)
+        rmse = float(np.sqrt(mean_squared_error(y_new, pred)))
+        if rmse > meta['cv_rmse'] * (1 + drift):
+            return f"RMSE on new rows {rmse:.6f} drifted past CV RMSE {meta['cv_rmse']:.6f}"
+    return None
+
+
+def _fit_binned(params, memory_budget, rows=None):
+    """
+    Fit `params` (LGBMRegressor-style) on the most recent `rows` rows (default:
+    all that fit) of a BinnedStudyData; returns the Booster and its row count.
+    """
+    data = BinnedStudyData(memory_budget=memory_budget, rows=rows)
+    params = dict(params, verbose=-1)
+    rounds = params.pop('n_estimators')
+    with telemetry.span('final_fit', 'train', rows=len(data.y)):
+        return lgb.train(params, data.full, num_boost_round=rounds), len(data.y)
+
+
+def search_and_save(trials=50, root=model_registry.REGISTRY_DIR, jobs=1, pruner='median',
+                    reason="full search", prev=None, promote=True, seed=None, memory_budget=None,
+                    truncate=False):
+    """
+    Run (or resume) the hyperparameter search, fit the final model on all
+    history and register it. Returns the new version id.
+    """
+    started = time.time()
+    parent = model_registry.current_version(root)
+    # Build the design matrix once for the whole study
+    X, y, trained_through = cache_design_matrix(memory_budget=memory_budget)
+    # One row cap, sized by a worker's share of the budget, for the study and the final fit
+    max_rows = study_rows(memory_budget, jobs, truncate) if memory_budget is not None else None
+
+    # Run (or resume) the study
+    study = run_study(trials=trials, jobs=jobs, pruner=pruner, seed=seed, memory_budget=memory_budget,
+                      truncate=truncate, rows=max_rows)
 
     # Train final model on all data using best params
-    X, y = load_data()
     best_params = study.best_params
     best_params.update({'objective': 'regression', 'random_state': 42})
-    final_model = LGBMRegressor(**best_params)
-    final_model.fit(X, y)
+    if memory_budget is not None:
+        booster, rows = _fit_binned(best_params, memory_budget, max_rows)
+    else:
+        final_model = LGBMRegressor(**best_params)
+        with telemetry.span('final_fit', 'train', rows=len(y)):
+            final_model.fit(X, y)
+        booster, rows = final_model.booster_, len(y)
+
+    lineage, history = _lineage('search', parent, rows, started, reason, prev)
+    meta = {'feature_cols': FEATURE_COLS, 'best_params': best_params,
+            'cv_rmse': study.best_value, 'study': study.study_name,
+            'searched_at': lineage['created_at'], 'data_version': data_version(get_engine()),
+            'trained_through': trained_through.isoformat(), 'rows': int(rows),
+            'rows_available': int(len(y)), 'memory_budget': memory_budget,
+            'lineage': lineage, 'history': history}
+    version = _save(booster, meta, root, promote)
+    print(f"Tuned model saved as version {version} ({reason})")
+    return version
+
+
+def train_and_save(trials: int = 50, root: str = model_registry.REGISTRY_DIR,
+                   jobs: int = 1, pruner: str = 'median', mode: str = 'search',
+                   search_every_days: int = SEARCH_EVERY_DAYS, drift: float = DRIFT_THRESHOLD,
+                   refresh_rounds: int = REFRESH_ROUNDS, promote: bool = True, seed: int = None,
+                   memory_budget: float = None, truncate: bool = False):
+    """
+    Train a new version of the current model in the registry at `root` and
+    (unless promote=False) make it current. Returns the version id, or None
+    when there was nothing to do.
+
+    mode='search' runs the full hyperparameter search and refits on all
+    history. mode='refresh' keeps the saved best params and continues boosting
+    the saved model for up to `refresh_rounds` trees on rows newer than it
+    was trained on; a refresh that would add no trees (too few new rows)
+    saves nothing. mode='auto' refreshes unless the last search is
+    `search_every_days` old or the model's RMSE on the new rows exceeds its
+    CV RMSE by more than `drift`. Without a current model that came from a
+    search every mode searches. `seed` makes the search's sampled params
+    reproducible. `memory_budget` (MB) trains the search out of core, with
+    peak memory held to the budget (see BinnedStudyData); if not every row
+    fits it raises, unless `truncate` allows training on the most recent
+    rows that do. The manifest records the rows used and available.
+    """
+    meta = load_meta(root)
+    if mode == 'search' or meta is None or meta['feature_cols'] != FEATURE_COLS:
+        reason = ("full search" if mode == 'search' else "no model to refresh" if meta is None
+                  else "feature columns changed")
+        return search_and_save(trials, root, jobs, pruner, reason, meta, promote, seed,
+                               memory_budget, truncate)
+
+    started = time.time()
+    model = model_registry.load(root=root)
+    X_new, y_new, dates = load_data(start=pd.Timestamp(meta['trained_through']) + pd.Timedelta(days=1))
+    if mode == 'auto':
+        reason = _search_reason(meta, model, X_new, y_new, search_every_days, drift)
+        if reason is not None:
+            return search_and_save(trials, root, jobs, pruner, reason, meta, promote, seed,
+                                   memory_budget, truncate)
+    if not len(y_new):
+        print(f"Model already trained through {meta['trained_through'][:10]}; nothing to refresh")
+        return
+    # No leaf can hold fewer than min_child_samples rows, so fewer new rows grow no trees;
+    # trained_through stays put and they are refreshed on once enough have arrived
+    min_rows = meta['best_params'].get('min_child_samples', 20)
+    if len(y_new) < min_rows:
+        print(f"Only {len(y_new)} new rows (min_child_samples is {min_rows}); nothing to refresh")
+        return
 
-    # Save the tuned model
-    os.makedirs(os.path.dirname(model_path), exist_ok=True)
-    joblib.dump(final_model, model_path)
-    print(f"Tuned model saved to {model_path}")
+    # Continue boosting the saved booster on the new rows only, with the searched params
+    refreshed = LGBMRegressor(**dict(meta['best_params'], n_estimators=refresh_rounds))
+    with telemetry.span('refresh_fit', 'train', rows=len(y_new)):
+        refreshed.fit(X_new, y_new, init_model=model)
+    added = refreshed.booster_.num_trees() - model.num_trees()
+    if added <= 0:
+        print(f"Refresh on {len(y_new)} new rows added no trees; model left at version {meta['version']}")
+        return
 
+    lineage, history = _lineage('refresh', meta['version'], len(y_new), started,
+                                f"{len(y_new)} new rows", meta)
+    meta = dict(meta, data_version=data_version(get_engine()),
+                trained_through=pd.Timestamp(dates.max()).isoformat(),
+                rows=meta['rows'] + int(len(y_new)),
+                rows_available=meta.get('rows_available', meta['rows']) + int(len(y_new)),
+                lineage=lineage, history=history)
+    version = _save(refreshed.booster_, meta, root, promote)
+    print(f"Refreshed model saved as version {version}: +{added} trees on {len(y_new)} "
+          f"new rows through {meta['trained_through'][:10]} ({lineage['seconds']:.1f}s)")
+    return version
@@ -1,62 +1,224 @@
 #!/usr/bin/env python3
+"""
+Exploratory plots of daily_features, aggregated before they are drawn.
+
+Summary figures in results/plots/:
+ - close_price_distribution.png, volume_distribution.png: histograms counted
+   year by year (one pass for the value range, one for the counts)
+ - correlation_heatmap.png: Pearson correlations from streamed sums of
+   products over rows where every feature is present
+ - rsi_over_time.png: one RSI line per symbol when at most MAX_LINES symbols
+   are plotted, otherwise the cross-sectional median and 10-90% band per date
+
+With `symbols`, each of them also gets results/plots/symbols/<SYMBOL>.png
+(close and SMA 20 above RSI 14). Every line is downsampled with LTTB to
+`points` points, and figures are rendered in `workers` processes.
+"""
 import os
-from sqlalchemy import create_engine
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from config import DATABASE_URL
+from scripts.feature_store import iter_features, read_features
 
-def main():
-    engine = create_engine(DATABASE_URL)
-    df = pd.read_sql_table('daily_features', engine, parse_dates=['date'])
+FEATURES = ['O', 'H', 'L', 'C', 'V', 'rsi_14', 'sma_20']
+OUT_DIR = os.path.join('results', 'plots')
+BINS = 50
+POINTS = 1000
+MAX_LINES = 10
+BAND = [0.1, 0.5, 0.9]
 
-    # Ensure output directory exists
-    out_dir = os.path.join('results', 'plots')
-    os.makedirs(out_dir, exist_ok=True)
 
-    # 1. Close price distribution
-    plt.figure()
-    df['C'].hist(bins=50)
-    plt.title('Close Price Distribution')
-    plt.xlabel('Close Price')
-    plt.ylabel('Frequency')
+def lttb(x, y, n):
+    """
+    Indices of `n` points of the series (x, y) chosen by Largest-Triangle-
+    Three-Buckets, which keeps peaks and troughs that plain striding drops.
+    """
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n - 2 buckets between the first and last point, which are always kept
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < n - 1 else size
+        cx, cy = x[hi:nhi].mean(), y[hi:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample(dates, *series, points=POINTS):
+    """`dates` and `series` at the LTTB points of the first series (NaNs dropped)."""
+    dates = np.asarray(dates)
+    keep = ~np.isnan(series[0])
+    idx = np.flatnonzero(keep)[lttb(dates[keep].view(np.int64), series[0][keep], points)]
+    return (dates[idx],) + tuple(s[idx] for s in series)
+
+
+def summarize(symbols=None, bins=BINS, points=POINTS):
+    """Histograms, correlations and RSI series, streamed one year of rows at a time."""
+    k = len(FEATURES)
+    lo, hi = np.full(k, np.inf), np.full(k, -np.inf)
+    shift, n, sums, prods = None, 0, np.zeros(k), np.zeros((k, k))
+    band, lines = [], {}
+
+    for df in iter_features(FEATURES, symbols):
+        X = df[FEATURES].to_numpy(dtype=np.float64)
+        with warnings.catch_warnings():  # all-NaN columns (e.g. early indicator rows)
+            warnings.simplefilter('ignore', RuntimeWarning)
+            lo = np.fmin(lo, np.nanmin(X, axis=0))
+            hi = np.fmax(hi, np.nanmax(X, axis=0))
+        X = X[~np.isnan(X).any(axis=1)]
+        if len(X):
+            # Sums around the first rows' values, so the covariance doesn't lose precision
+            shift = X[0].copy() if shift is None else shift
+            X -= shift
+            n += len(X)
+            sums += X.sum(axis=0)
+            prods += X.T @ X
+        rsi = df.groupby('date')['rsi_14'].quantile(BAND).unstack()
+        band.append(rsi.dropna())
+        if lines is not None:
+            for sym, part in df.groupby('symbol', observed=True, sort=False):
+                lines.setdefault(sym, []).append(part[['date', 'rsi_14']])
+            if len(lines) > MAX_LINES:
+                lines = None
+
+    mean = sums / max(n, 1)
+    cov = prods / max(n, 1) - np.outer(mean, mean)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cov / np.sqrt(np.outer(np.diag(cov), np.diag(cov)))
+
+    cols = [FEATURES.index('C'), FEATURES.index('V')]
+    edges = {FEATURES[c]: np.linspace(lo[c], hi[c], bins + 1) for c in cols if np.isfinite(lo[c])}
+    counts = {c: np.zeros(bins, dtype=np.int64) for c in edges}
+    for df in iter_features(list(edges), symbols):
+        for c, e in edges.items():
+            counts[c] += np.histogram(df[c].to_numpy(dtype=np.float64), bins=e)[0]
+
+    band = pd.concat(band) if band else pd.DataFrame(columns=BAND)
+    rsi = None
+    if lines:
+        rsi = {}
+        for sym, parts in sorted(lines.items()):
+            part = pd.concat(parts)
+            rsi[str(sym)] = downsample(part['date'].to_numpy(),
+                                       part['rsi_14'].to_numpy(dtype=np.float64), points=points)
+    median = band[0.5].to_numpy(dtype=np.float64)
+    if len(median):
+        keep = lttb(band.index.to_numpy().view(np.int64), median, points)
+        band = band.iloc[keep]
+    return {'hist': {c: (edges[c], counts[c]) for c in edges}, 'corr': corr, 'n': n,
+            'rsi': rsi, 'band': (band.index.to_numpy(), band.to_numpy(dtype=np.float64).T)}
+
+
+def _save(path):
     plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, 'close_price_distribution.png'))
+    plt.savefig(path)
     plt.close()
 
-    # 2. Volume distribution
+
+def plot_histogram(edges, counts, title, xlabel, path):
     plt.figure()
-    df['V'].hist(bins=50)
-    plt.title('Volume Distribution')
-    plt.xlabel('Volume')
+    plt.stairs(counts, edges, fill=True)
+    plt.title(title)
+    plt.xlabel(xlabel)
     plt.ylabel('Frequency')
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, 'volume_distribution.png'))
-    plt.close()
+    _save(path)
 
-    # 3. RSI over time
+
+def plot_rsi(rsi, band, path):
     plt.figure()
-    for symbol, group in df.groupby('symbol'):
-        plt.plot(group['date'], group['rsi_14'], label=symbol)
+    if rsi is not None:
+        for symbol, (dates, values) in rsi.items():
+            plt.plot(dates, values, label=symbol)
+        plt.legend()
+    else:
+        dates, (p10, p50, p90) = band
+        plt.fill_between(dates, p10, p90, alpha=0.3, label='10-90%')
+        plt.plot(dates, p50, label='median')
+        plt.legend()
     plt.title('RSI 14 Over Time')
     plt.xlabel('Date')
     plt.ylabel('RSI 14')
-    plt.legend()
     plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, 'rsi_over_time.png'))
-    plt.close()
+    _save(path)
+
 
-    # 4. Correlation heatmap
+def plot_correlation(corr, path):
     plt.figure()
-    features = ['O','H','L','C','V','rsi_14','sma_20']
-    corr = df[features].corr()
     im = plt.imshow(corr, interpolation='nearest', aspect='auto')
     plt.colorbar(im)
-    plt.xticks(range(len(features)), features, rotation=45)
-    plt.yticks(range(len(features)), features)
+    plt.xticks(range(len(FEATURES)), FEATURES, rotation=45)
+    plt.yticks(range(len(FEATURES)), FEATURES)
     plt.title('Feature Correlation Heatmap')
-    plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, 'correlation_heatmap.png'))
-    plt.close()
+    _save(path)
+
+
+def plot_symbols(df, out_dir, points=POINTS):
+    """Close with SMA 20 above RSI 14 for each symbol in `df` (runs in a worker process)."""
+    for symbol, part in df.groupby('symbol', observed=True, sort=False):
+        dates = part['date'].to_numpy()
+        values = part[['C', 'sma_20', 'rsi_14']].to_numpy(dtype=np.float64).T
+        fig, (top, bottom) = plt.subplots(2, 1, sharex=True, figsize=(10, 6),
+                                          gridspec_kw={'height_ratios': [2, 1]})
+        top.plot(*downsample(dates, values[0], points=points), label='Close')
+        top.plot(*downsample(dates, values[1], points=points), label='SMA 20')
+        top.set_title(str(symbol))
+        top.legend()
+        bottom.plot(*downsample(dates, values[2], points=points), color='tab:purple')
+        bottom.axhline(70, color='grey', lw=0.5)
+        bottom.axhline(30, color='grey', lw=0.5)
+        bottom.set_ylabel('RSI 14')
+        fig.autofmt_xdate()
+        fig.tight_layout()
+        fig.savefig(os.path.join(out_dir, f"{symbol}.png"))
+        plt.close(fig)
+
+
+def main(symbols=None, points=POINTS, workers=None, out_dir=OUT_DIR):
+    """
+    Write the summary figures (over `symbols`, or every symbol) and, when
+    `symbols` is given, one figure per symbol.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    stats = summarize(symbols, points=points)
+    tasks = [(plot_rsi, stats['rsi'], stats['band'], os.path.join(out_dir, 'rsi_over_time.png')),
+             (plot_correlation, stats['corr'], os.path.join(out_dir, 'correlation_heatmap.png'))]
+    for col, title, xlabel, name in [('C', 'Close Price Distribution', 'Close Price',
+                                      'close_price_distribution.png'),
+                                     ('V', 'Volume Distribution', 'Volume', 'volume_distribution.png')]:
+        if col in stats['hist']:
+            tasks.append((plot_histogram, *stats['hist'][col], title, xlabel, os.path.join(out_dir, name)))
+    if symbols:
+        symbol_dir = os.path.join(out_dir, 'symbols')
+        os.makedirs(symbol_dir, exist_ok=True)
+        # Read here: workers must not open the database (DuckDB allows one process per file)
+        df = read_features(['C', 'sma_20', 'rsi_14'], symbols=symbols)
+        codes = df['symbol'].cat.codes.to_numpy()
+        batches = np.array_split(np.arange(len(df['symbol'].cat.categories)),
+                                 min(len(symbols), 4 * (workers or os.cpu_count() or 1)))
+        tasks += [(plot_symbols, df[np.isin(codes, b)], symbol_dir, points) for b in batches if len(b)]
 
-    print(f"Plots saved to {out_dir}")
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        for fn, *args in tasks:
+            fn(*args)
+    else:
+        # spawn: the pipeline runs this stage on a thread, and forking a threaded process is unsafe
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            for future in [pool.submit(fn, *args) for fn, *args in tasks]:
+                future.result()
+    print(f"Plots saved to {out_dir} ({stats['n']:,} complete rows, "
+          f"{len(symbols) if symbols else 0} symbol figures, {workers} processes)")
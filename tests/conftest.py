@@ -0,0 +1,40 @@
+# tests/conftest.py
+"""
+Runs the suite against a throwaway config: the scripts import DATABASE_URL
+and the Alpha Vantage settings from a `config` module, so one is written to
+a temporary directory that goes first on sys.path and PYTHONPATH (spawned
+shard workers and CLI subprocesses import it too). DATABASE_URL is read from
+the environment, which the `db` fixture points at a fresh SQLite file.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = '''import os
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///data/stock.db')
+ALPHA_VANTAGE_API_KEY = 'test'
+BASE_URL = 'http://127.0.0.1:9/query'
+'''
+
+_config_dir = tempfile.mkdtemp(prefix='stock-tests-')
+with open(os.path.join(_config_dir, 'config.py'), 'w') as f:
+    f.write(CONFIG)
+sys.path[:0] = [_config_dir, ROOT]
+os.environ['PYTHONPATH'] = os.pathsep.join(
+    [_config_dir, ROOT] + ([os.environ['PYTHONPATH']] if os.environ.get('PYTHONPATH') else []))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Work in `tmp_path` against an empty SQLite database there; yields its URL."""
+    from scripts import db as db_module
+    url = f"sqlite:///{tmp_path / 'stock.db'}"
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DATABASE_URL', url)
+    monkeypatch.setattr(db_module, 'DATABASE_URL', url)
+    yield url
+    db_module.dispose_engines()
+    db_module._engines.pop(url, None)